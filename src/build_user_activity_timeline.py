@@ -0,0 +1,207 @@
+"""
+사용자 활동 타임라인 생성 - 정렬된 테이블 스트림의 k-way 병합
+담당: 조수진
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import shutil
+import logging
+
+from load_data import open_parquet_file
+from save_data import save_batches_to_gcs
+from sampling import get_sampled_user_ids, sample_output_dataset
+
+logger = logging.getLogger(__name__)
+
+# 타임라인 소스 정의 (source_table 태그, 테이블명, 데이터셋, 사용자 컬럼, 시간 컬럼)
+# accounts_friendrequest는 보낸 사람(능동적 활동)만 포함
+# 'processed' 소스는 샘플 실행 시 샘플 결과 위치(processed_sample_<rate>)에서 읽음
+TIMELINE_SOURCES = [
+    ('accounts_blockrecord_processed', 'accounts_blockrecord_processed', 'processed', 'user_id', 'created_at'),
+    ('accounts_failpaymenthistory', 'accounts_failpaymenthistory', 'votes', 'user_id', 'created_at'),
+    ('accounts_paymenthistory', 'accounts_paymenthistory', 'votes', 'user_id', 'created_at'),
+    ('accounts_pointhistory', 'accounts_pointhistory', 'votes', 'user_id', 'created_at'),
+    ('accounts_timelinereport', 'accounts_timelinereport', 'votes', 'user_id', 'created_at'),
+    ('accounts_user_processed', 'accounts_user_processed', 'processed', 'id', 'created_at'),
+    ('accounts_userquestionrecord_processed', 'accounts_userquestionrecord_processed', 'processed', 'user_id', 'created_at'),
+    ('event_receipts', 'event_receipts', 'votes', 'user_id', 'created_at'),
+    ('polls_questionreport', 'polls_questionreport', 'votes', 'user_id', 'created_at'),
+    ('polls_questionset', 'polls_questionset', 'votes', 'user_id', 'created_at'),
+    ('accounts_friendrequest_send', 'accounts_friendrequest', 'votes', 'send_user_id', 'created_at')
+]
+
+SOURCE_TAGS = [source[0] for source in TIMELINE_SOURCES]
+
+
+def _normalize_batch(batch: pa.RecordBatch, user_col: str, ts_col: str):
+    """(user_id, created_at) 정규화: 정수 사용자 ID + ns 단위 타임스탬프, 결측 제거"""
+    user_ids = pd.to_numeric(batch.column(user_col).to_pandas(), errors='coerce')
+    created_at = pd.to_datetime(batch.column(ts_col).to_pandas(), format='ISO8601', errors='coerce')
+    if getattr(created_at.dt, 'tz', None) is not None:
+        created_at = created_at.dt.tz_convert(None)
+
+    valid = user_ids.notna().to_numpy() & created_at.notna().to_numpy()
+    return (
+        user_ids.to_numpy()[valid].astype(np.int64),
+        created_at.to_numpy(dtype='datetime64[ns]')[valid].view(np.int64)
+    )
+
+
+def _write_sorted_runs(source_index: int, run_dir: str, run_rows: int, processed_dataset: str = 'processed',
+                       sampled_user_ids: np.ndarray = None) -> list:
+    """소스 테이블을 run_rows 단위로 읽어 (user_id, created_at) 정렬된 run 파일로 기록
+
+    sampled_user_ids를 지정하면 샘플 사용자의 행만 기록 (원본 소스도 전처리 결과와 같은 사용자 집합)
+    """
+    tag, table_name, dataset, user_col, ts_col = TIMELINE_SOURCES[source_index]
+    if dataset == 'processed':
+        dataset = processed_dataset
+    run_paths = []
+
+    with open_parquet_file(table_name, dataset) as parquet_file:
+        for batch in parquet_file.iter_batches(batch_size=run_rows, columns=[user_col, ts_col]):
+            user_ids, timestamps = _normalize_batch(batch, user_col, ts_col)
+            if sampled_user_ids is not None:
+                sampled = np.isin(user_ids, sampled_user_ids)
+                user_ids, timestamps = user_ids[sampled], timestamps[sampled]
+            if len(user_ids) == 0:
+                continue
+
+            order = np.lexsort((timestamps, user_ids))
+            run_path = os.path.join(run_dir, f"{tag}_{len(run_paths):04d}.parquet")
+            pq.write_table(
+                pa.table({'user_id': user_ids[order], 'created_at': timestamps[order]}),
+                run_path,
+                compression='snappy'
+            )
+            run_paths.append(run_path)
+
+    logger.info(f"   {tag}: 정렬 run {len(run_paths)}개 생성")
+    return run_paths
+
+
+class _RunStream:
+    """정렬된 run 파일 하나를 배치 단위로 읽는 스트림"""
+
+    def __init__(self, path: str, source_code: int, batch_rows: int):
+        self.source_code = source_code
+        self._batches = pq.ParquetFile(path).iter_batches(batch_size=batch_rows)
+        self.user_ids = self.timestamps = None
+        self.refill()
+
+    def refill(self) -> bool:
+        """버퍼가 비면 다음 배치를 읽음 - 스트림이 끝나면 False"""
+        for batch in self._batches:
+            if batch.num_rows > 0:
+                self.user_ids = batch.column('user_id').to_numpy()
+                self.timestamps = batch.column('created_at').to_numpy()
+                return True
+        self.user_ids = self.timestamps = None
+        return False
+
+    def count_until(self, bound_user: int, bound_ts: int) -> int:
+        """버퍼 앞부분 중 (user_id, created_at) <= bound 인 행 수"""
+        lower = np.searchsorted(self.user_ids, bound_user, side='left')
+        upper = np.searchsorted(self.user_ids, bound_user, side='right')
+        return lower + np.searchsorted(self.timestamps[lower:upper], bound_ts, side='right')
+
+
+def merge_sorted_runs(streams: list):
+    """k-way 병합: 스트림 버퍼의 마지막 키 중 최소값까지를 한 블록으로 내보냄
+
+    각 블록은 모든 스트림에서 bound 이하인 행만 모은 것이므로 블록끼리는 이미 정렬 순서이고,
+    메모리는 (스트림 수 x 배치 크기)로 제한된다.
+    """
+
+    tag_dictionary = pa.array(SOURCE_TAGS, type=pa.string())
+    active = [stream for stream in streams if stream.user_ids is not None]
+
+    while active:
+        bound_user, bound_ts = min((s.user_ids[-1], s.timestamps[-1]) for s in active)
+
+        user_parts, ts_parts, code_parts = [], [], []
+        for stream in active:
+            count = stream.count_until(bound_user, bound_ts)
+            if count == 0:
+                continue
+
+            user_parts.append(stream.user_ids[:count])
+            ts_parts.append(stream.timestamps[:count])
+            code_parts.append(np.full(count, stream.source_code, dtype=np.int8))
+
+            if count == len(stream.user_ids):
+                stream.refill()
+            else:
+                stream.user_ids = stream.user_ids[count:]
+                stream.timestamps = stream.timestamps[count:]
+
+        active = [stream for stream in active if stream.user_ids is not None]
+
+        user_ids = np.concatenate(user_parts)
+        timestamps = np.concatenate(ts_parts)
+        codes = np.concatenate(code_parts)
+        order = np.lexsort((timestamps, user_ids))
+
+        yield pa.table({
+            'user_id': pa.array(user_ids[order], type=pa.int64()),
+            'created_at': pa.array(timestamps[order].view('datetime64[ns]'), type=pa.timestamp('ns')),
+            'source_table': pa.DictionaryArray.from_arrays(pa.array(codes[order], type=pa.int8()), tag_dictionary)
+        })
+
+
+def build_user_activity_timeline(run_rows: int = 2_000_000, merge_batch_rows: int = 100_000,
+                                 rows_per_file: int = 5_000_000, sample_rate: float = None) -> dict:
+    """전체 소스 테이블을 (user_id, created_at) 순으로 병합한 user_activity_timeline 생성
+
+    sample_rate를 지정하면 샘플 전처리 결과를 입력으로 샘플 사용자 타임라인만 샘플 결과 위치에 저장
+    """
+
+    logger.info("🔧 조수진: user_activity_timeline 생성 시작...")
+
+    dataset = sample_output_dataset(sample_rate)
+    sampled_user_ids = None
+    if sample_rate is not None:
+        sampled_user_ids = get_sampled_user_ids(sample_rate).astype(np.int64)
+
+    run_dir = f"/tmp/user_activity_timeline_runs_{os.getpid()}"
+    os.makedirs(run_dir, exist_ok=True)
+
+    try:
+        # 1. 소스별 외부 정렬 (run_rows 단위 정렬 run 파일)
+        streams = []
+        for source_index in range(len(TIMELINE_SOURCES)):
+            for run_path in _write_sorted_runs(source_index, run_dir, run_rows, dataset, sampled_user_ids):
+                streams.append(_RunStream(run_path, source_index, merge_batch_rows))
+
+        logger.info(f"   병합 스트림: {len(streams)}개 (최대 버퍼 {len(streams) * merge_batch_rows:,}행)")
+
+        # 2. k-way 병합 후 user_id 구간별 분할 저장
+        result = save_batches_to_gcs(
+            merge_sorted_runs(streams),
+            'user_activity_timeline',
+            dataset,
+            rows_per_file=rows_per_file,
+            presorted=True,
+            suffix=''
+        )
+
+        logger.info(f"✅ 조수진: user_activity_timeline 생성 완료 ({result['rows']:,}행)")
+        return result
+
+    except Exception as e:
+        logger.error(f"❌ 조수진: user_activity_timeline 생성 실패 - {str(e)}")
+        raise
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+# 사용 예시
+if __name__ == "__main__":
+    try:
+        result = build_user_activity_timeline()
+        print(f"타임라인 생성 완료: {result}")
+    except Exception as e:
+        print(f"테스트 실패: {e}")
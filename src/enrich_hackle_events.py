@@ -0,0 +1,173 @@
+"""
+hackle_events 디바이스/사용자 속성 결합 - 정수 키 차원 인덱스 + 딕셔너리 인코딩
+담당: 조수진
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import logging
+
+from load_data import open_parquet_file
+from save_data import save_batches_to_gcs
+from sampling import sample_output_dataset, resolve_session_properties
+
+logger = logging.getLogger(__name__)
+
+# 이벤트에 딕셔너리 인코딩으로 붙일 저카디널리티 속성 (차원: 컬럼 목록)
+# 고카디널리티/수치 속성(school_id, grade 등)은 user_key / device_key로 차원 테이블과 조인
+EVENT_PROPERTY_COLUMNS = {
+    'device': ['device_model', 'device_vendor'],
+    'session': ['osname', 'language', 'versionname'],
+    'user': ['gender']
+}
+
+
+def build_dimension(df: pd.DataFrame, key_col: str, key_name: str) -> pd.DataFrame:
+    """문자열 키 → int32 대리키(surrogate key) 차원 테이블 (키 중복 시 마지막 행 유지)"""
+    dim = df.drop_duplicates(subset=[key_col], keep='last').reset_index(drop=True)
+    dim.insert(0, key_name, np.arange(len(dim), dtype=np.int32))
+    return dim
+
+
+def _dictionary_codes(values: pd.Series):
+    """속성 값 → (int32 코드 배열, arrow 딕셔너리) - 결측은 코드 -1"""
+    codes, uniques = pd.factorize(values)
+    return codes.astype(np.int32), pa.array(np.asarray(uniques, dtype=object), type=pa.string())
+
+
+def _take_keys(mapping: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """positions(-1 = 매칭 없음)로 mapping 조회, 매칭 없으면 -1"""
+    if len(mapping) == 0:
+        return np.full(len(positions), -1, dtype=np.int32)
+    return np.where(positions >= 0, mapping[positions.clip(0)], -1).astype(np.int32)
+
+
+def _nullable_int32(values: np.ndarray) -> pa.Array:
+    return pa.array(values, type=pa.int32(), mask=values < 0)
+
+
+def _dictionary_column(codes_by_key: np.ndarray, dictionary: pa.Array, keys: np.ndarray) -> pa.DictionaryArray:
+    """차원 키별 코드를 이벤트 단위로 펼친 딕셔너리 배열 (문자열 복제 없음)"""
+    indices = _take_keys(codes_by_key, keys)
+    return pa.DictionaryArray.from_arrays(_nullable_int32(indices), dictionary)
+
+
+def build_hackle_dimensions() -> dict:
+    """device/user 차원 테이블과 session → 차원 키 매핑 생성"""
+
+    with open_parquet_file('device_properties', 'hackle') as parquet_file:
+        device_dim = build_dimension(parquet_file.read().to_pandas(), 'device_id', 'device_key')
+
+    with open_parquet_file('user_properties', 'hackle') as parquet_file:
+        user_dim = build_dimension(parquet_file.read().to_pandas(), 'user_id', 'user_key')
+
+    # 세션별 속성은 컬럼별 마지막 non-null 기록 사용 (세션당 최대 수 건, 익명 기록이 사용자를 덮어쓰지 않음)
+    with open_parquet_file('hackle_properties', 'hackle') as parquet_file:
+        sessions = resolve_session_properties(parquet_file.read().to_pandas())
+
+    # user_id는 문자열로 정규화해 매칭 (로그인 전 세션은 user_id 결측 → 매칭 없음)
+    user_positions = pd.Index(user_dim['user_id'].astype(str)).get_indexer(sessions['user_id'].astype(str))
+    user_positions[sessions['user_id'].isna().to_numpy()] = -1
+
+    session_map = {
+        'index': pd.Index(sessions['session_id']),
+        'device_key': _take_keys(
+            device_dim['device_key'].to_numpy(),
+            pd.Index(device_dim['device_id']).get_indexer(sessions['device_id'])
+        ),
+        'user_key': _take_keys(user_dim['user_key'].to_numpy(), user_positions)
+    }
+
+    # 속성별 (차원 키 → 딕셔너리 코드) 매핑
+    property_codes = {}
+    for dimension, frame in [('device', device_dim), ('session', sessions), ('user', user_dim)]:
+        for col in EVENT_PROPERTY_COLUMNS[dimension]:
+            if col in frame.columns:
+                property_codes[col] = (dimension, *_dictionary_codes(frame[col]))
+
+    logger.info(f"   차원 인덱스: 디바이스 {len(device_dim):,}개, 사용자 {len(user_dim):,}명, 세션 {len(sessions):,}개")
+
+    return {
+        'device_dim': device_dim,
+        'user_dim': user_dim,
+        'session_map': session_map,
+        'property_codes': property_codes
+    }
+
+
+def enrich_batch(batch: pa.RecordBatch, dimensions: dict) -> pa.Table:
+    """이벤트 배치에 device_key / user_key와 딕셔너리 인코딩 속성 컬럼 추가"""
+    session_map = dimensions['session_map']
+
+    session_positions = session_map['index'].get_indexer(batch.column('session_id').to_pandas())
+    keys = {
+        'session': session_positions.astype(np.int32),
+        'device': _take_keys(session_map['device_key'], session_positions),
+        'user': _take_keys(session_map['user_key'], session_positions)
+    }
+
+    table = pa.Table.from_batches([batch])
+    table = table.append_column('device_key', _nullable_int32(keys['device']))
+    table = table.append_column('user_key', _nullable_int32(keys['user']))
+
+    for col, (dimension, codes, dictionary) in dimensions['property_codes'].items():
+        table = table.append_column(col, _dictionary_column(codes, dictionary, keys[dimension]))
+
+    return table
+
+
+def enrich_hackle_events(batch_rows: int = 1_000_000, sample_rate: float = None) -> dict:
+    """전처리된 hackle_events에 차원 키/속성을 스트리밍으로 결합해 저장
+
+    sample_rate를 지정하면 같은 비율의 샘플 전처리 결과를 읽고 차원 테이블과 함께 샘플 결과 위치에 저장
+    """
+
+    logger.info("🔧 조수진: hackle_events 속성 결합 시작...")
+    dataset = sample_output_dataset(sample_rate)
+
+    try:
+        # 1. 차원 인덱스
+        dimensions = build_hackle_dimensions()
+
+        # 2. 차원 테이블 저장 (user_key / device_key 조인용)
+        for dim_name in ['device_dim', 'user_dim']:
+            save_batches_to_gcs(
+                [pa.Table.from_pandas(dimensions[dim_name], preserve_index=False)],
+                f"hackle_{dim_name}",
+                dataset,
+                suffix=''
+            )
+
+        # 3. 이벤트 스트리밍 결합
+        match_counts = {'events': 0, 'device': 0, 'user': 0}
+
+        def enriched_batches():
+            with open_parquet_file('hackle_events_processed', dataset) as parquet_file:
+                for batch in parquet_file.iter_batches(batch_size=batch_rows):
+                    table = enrich_batch(batch, dimensions)
+                    match_counts['events'] += table.num_rows
+                    match_counts['device'] += table.num_rows - table.column('device_key').null_count
+                    match_counts['user'] += table.num_rows - table.column('user_key').null_count
+                    yield table
+
+        result = save_batches_to_gcs(enriched_batches(), 'hackle_events_enriched', dataset, suffix='')
+
+        total = max(match_counts['events'], 1)
+        logger.info(f"✅ 조수진: hackle_events 속성 결합 완료")
+        logger.info(f"   디바이스 매칭: {match_counts['device']:,}건 ({match_counts['device'] / total * 100:.2f}%)")
+        logger.info(f"   사용자 매칭: {match_counts['user']:,}건 ({match_counts['user'] / total * 100:.2f}%)")
+
+        return result
+
+    except Exception as e:
+        logger.error(f"❌ 조수진: hackle_events 속성 결합 실패 - {str(e)}")
+        raise
+
+# 사용 예시
+if __name__ == "__main__":
+    try:
+        result = enrich_hackle_events()
+        print(f"속성 결합 완료: {result}")
+    except Exception as e:
+        print(f"테스트 실패: {e}")
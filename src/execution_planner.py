@@ -0,0 +1,263 @@
+"""
+실행 계획 수립 - parquet 메타데이터 기반 in-memory / chunked / out-of-core 선택
+담당: 김재문
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import math
+import os
+import shutil
+import logging
+import psutil
+
+from load_data import open_parquet_file
+
+logger = logging.getLogger(__name__)
+
+# 가용 메모리 중 한 작업에 할당할 비율
+MEMORY_BUDGET_RATIO = 0.5
+
+# 문자열 값 하나당 pandas object 오버헤드 (PyObject 헤더 + 포인터)
+PYTHON_STR_OVERHEAD_BYTES = 57
+
+# 테이블별 실행 특성
+# - memory_factor: 전처리 중 최대 메모리 / 로드된 DataFrame 크기 (중간 결과·마스크 포함)
+# - chunk_mode: 'rows' = 행 독립 처리 (row group 단위 스트리밍 가능)
+#               'partition' = partition_key 기준 해시 분할 시 파티션 독립 처리
+#               None = 전체 데이터 필요 (분위수 등 전역 통계)
+TABLE_EXECUTION_PROFILES = {
+    'accounts_user': {'memory_factor': 2.5, 'chunk_mode': None},
+    'hackle_events': {'memory_factor': 3.0, 'chunk_mode': 'partition', 'partition_key': 'session_id'},
+    'accounts_userquestionrecord': {'memory_factor': 1.5, 'chunk_mode': 'rows'},
+    'accounts_blockrecord': {'memory_factor': 2.0, 'chunk_mode': 'rows'}
+}
+
+DEFAULT_EXECUTION_PROFILE = {'memory_factor': 3.0, 'chunk_mode': None}
+
+# out-of-core 해시 분할 시 입력 배치 크기 (파티션별 버퍼 합계도 이 행 수 수준으로 유지)
+PARTITION_SPLIT_BATCH_ROWS = 500_000
+
+
+def get_memory_budget() -> int:
+    """작업당 메모리 예산 (bytes) - 컨테이너 메모리 제한(cgroup)이 있으면 함께 고려"""
+    available = psutil.virtual_memory().available
+
+    # docker memory limit (cgroup v2 / v1)
+    for limit_path, usage_path in [
+        ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+        ('/sys/fs/cgroup/memory/memory.limit_in_bytes', '/sys/fs/cgroup/memory/memory.usage_in_bytes')
+    ]:
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read().strip())
+            if limit != 'max' and int(limit) < 2**60:
+                available = min(available, int(limit) - usage)
+            break
+        except (OSError, ValueError):
+            continue
+
+    return int(max(available, 0) * MEMORY_BUDGET_RATIO)
+
+
+def estimate_dataframe_bytes(metadata: pq.FileMetaData) -> int:
+    """parquet 메타데이터로 pandas 로드 시 메모리 추정 (압축 해제 크기 + 문자열 객체 오버헤드)"""
+    total = 0
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for col in range(row_group.num_columns):
+            column = row_group.column(col)
+            if column.physical_type == 'BYTE_ARRAY':
+                total += column.total_uncompressed_size + row_group.num_rows * PYTHON_STR_OVERHEAD_BYTES
+            else:
+                total += row_group.num_rows * 8
+    return total
+
+
+def plan_table_execution(table_name: str, metadata: pq.FileMetaData, memory_budget: int = None,
+                         row_fraction: float = 1.0) -> dict:
+    """테이블 하나의 실행 전략 결정
+
+    - in_memory: 전체 로드 후 pandas 전처리 (기존 방식)
+    - chunked: row group 배치 단위 전처리 후 스트리밍 저장
+    - out_of_core: partition_key 해시 분할 → 파티션별 전처리 → 스트리밍 저장
+
+    분할할 수 없는 테이블(chunk_mode=None)이 예산을 초과하면 MemoryError
+    row_fraction: 실제 로드될 행 비율 (샘플링 실행 시 sample_rate)
+    """
+
+    profile = TABLE_EXECUTION_PROFILES.get(table_name, DEFAULT_EXECUTION_PROFILE)
+    if memory_budget is None:
+        memory_budget = get_memory_budget()
+
+    rows = metadata.num_rows
+    uncompressed_bytes = sum(metadata.row_group(rg).total_byte_size for rg in range(metadata.num_row_groups))
+    dataframe_bytes = int(estimate_dataframe_bytes(metadata) * row_fraction)
+    required_bytes = int(dataframe_bytes * profile['memory_factor'])
+    bytes_per_row = max(required_bytes / (rows * row_fraction), 1) if rows > 0 else 1
+
+    plan = {
+        'table_name': table_name,
+        'rows': rows,
+        'uncompressed_mb': round(uncompressed_bytes / 1024**2, 1),
+        'estimated_memory_mb': round(required_bytes / 1024**2, 1),
+        'memory_budget_mb': round(memory_budget / 1024**2, 1),
+        'strategy': 'in_memory',
+        'chunk_rows': None,
+        'num_partitions': None,
+        'partition_key': profile.get('partition_key'),
+        'chunk_mode': profile['chunk_mode']
+    }
+
+    if required_bytes > memory_budget:
+        if profile['chunk_mode'] == 'rows':
+            plan['strategy'] = 'chunked'
+            plan['chunk_rows'] = max(int(memory_budget / bytes_per_row), 10_000)
+        elif profile['chunk_mode'] == 'partition':
+            plan['strategy'] = 'out_of_core'
+            # 해시 분할 편차를 고려해 여유 있게 분할
+            plan['num_partitions'] = max(math.ceil(required_bytes / memory_budget * 1.5), 2)
+        else:
+            # 전역 통계가 필요한 테이블은 분할 실행 불가 - 로드 전에 이 작업만 실패 처리
+            raise MemoryError(f"{table_name}: 예상 메모리 {plan['estimated_memory_mb']:,}MB가 예산 "
+                              f"{plan['memory_budget_mb']:,}MB를 초과하며 분할 실행 불가")
+
+    logger.info(f"🧭 실행 계획: {table_name} → {plan['strategy']}")
+    logger.info(f"   {rows:,}행, 압축 해제 {plan['uncompressed_mb']:,}MB, "
+                f"예상 메모리 {plan['estimated_memory_mb']:,}MB / 예산 {plan['memory_budget_mb']:,}MB")
+    if plan['chunk_rows']:
+        logger.info(f"   배치 크기: {plan['chunk_rows']:,}행")
+    if plan['num_partitions']:
+        logger.info(f"   파티션: {plan['partition_key']} 기준 {plan['num_partitions']}개")
+
+    return plan
+
+
+def _to_arrow(df: pd.DataFrame, input_schema: pa.Schema) -> pa.Table:
+    """전처리 결과를 arrow로 변환 - 입력 컬럼은 원본 타입으로 고정 (배치별 전부 결측 시 null 타입 방지)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if field.name in input_schema.names:
+            target_type = input_schema.field(field.name).type
+            if field.type != target_type:
+                table = table.set_column(i, field.name, table.column(i).cast(target_type))
+    return table
+
+
+def iter_chunked_results(table_name: str, dataset: str, preprocess_func, plan: dict, prepare_func=None):
+    """chunked 실행: row group 배치 단위로 로드 → 전처리 → arrow 테이블 반환
+
+    preprocess_func: allow_empty=True로 호출 (배치/파티션 하나의 결과가 비는 것은 허용)
+    prepare_func: 전처리 전 배치에 적용할 함수 (검증/샘플링, DataFrame 반환)
+    """
+
+    with open_parquet_file(table_name, dataset) as parquet_file:
+        input_schema = parquet_file.schema_arrow
+
+        for i, batch in enumerate(parquet_file.iter_batches(batch_size=plan['chunk_rows'])):
+            logger.info(f"   배치 {i + 1}: {batch.num_rows:,}행")
+            df = batch.to_pandas()
+            del batch
+
+            if prepare_func is not None:
+                df = prepare_func(df)
+            if len(df) == 0:
+                continue
+
+            # 배치 하나가 전부 제거되는 것은 정상 - 전체 결과가 비면 save_batches_to_gcs에서 실패 처리
+            df_clean = preprocess_func(df, allow_empty=True)
+            del df
+            if len(df_clean) == 0:
+                continue
+            yield _to_arrow(df_clean, input_schema)
+
+
+def iter_partitioned_results(table_name: str, dataset: str, preprocess_func, plan: dict, prepare_func=None):
+    """out-of-core 실행: partition_key 해시로 로컬 파티션 파일 분할 → 파티션별 전처리"""
+
+    partition_key = plan['partition_key']
+    num_partitions = plan['num_partitions']
+    partition_dir = f"/tmp/{table_name}_partitions_{os.getpid()}"
+    os.makedirs(partition_dir, exist_ok=True)
+
+    try:
+        # 1. 해시 분할 (같은 키는 항상 같은 파티션 → 파티션 내 중복 제거가 전체 중복 제거와 동일)
+        #    파티션별로 행을 모아 기록 - 입력 배치마다 파티션 수만큼 작은 row group이 생기지 않도록
+        flush_rows = max(PARTITION_SPLIT_BATCH_ROWS // num_partitions, 10_000)
+        partition_rows = [0] * num_partitions
+
+        with open_parquet_file(table_name, dataset) as parquet_file:
+            input_schema = parquet_file.schema_arrow
+            writers = [None] * num_partitions
+            pending = [[] for _ in range(num_partitions)]
+            pending_rows = [0] * num_partitions
+
+            def flush_partition(p):
+                if writers[p] is None:
+                    writers[p] = pq.ParquetWriter(os.path.join(partition_dir, f"part-{p:04d}.parquet"),
+                                                  input_schema, compression='snappy')
+                writers[p].write_table(pa.Table.from_batches(pending[p], schema=input_schema))
+                partition_rows[p] += pending_rows[p]
+                pending[p], pending_rows[p] = [], 0
+
+            try:
+                for batch in parquet_file.iter_batches(batch_size=PARTITION_SPLIT_BATCH_ROWS):
+                    keys = batch.column(partition_key).to_numpy(zero_copy_only=False)
+                    partition_ids = pd.util.hash_array(keys) % num_partitions
+                    for p in np.unique(partition_ids):
+                        part = batch.filter(pa.array(partition_ids == p))
+                        pending[p].append(part)
+                        pending_rows[p] += part.num_rows
+                        if pending_rows[p] >= flush_rows:
+                            flush_partition(p)
+
+                for p in range(num_partitions):
+                    if pending_rows[p] > 0:
+                        flush_partition(p)
+            finally:
+                for writer in writers:
+                    if writer is not None:
+                        writer.close()
+
+        logger.info(f"   {partition_key} 기준 {num_partitions}개 파티션 분할 완료 "
+                    f"(파티션당 {min(partition_rows):,} ~ {max(partition_rows):,}행)")
+
+        # 2. 파티션별 전처리 (빈 파티션 / 전처리 후 빈 결과는 해당 파티션만 건너뜀,
+        #    전체 결과가 비면 save_batches_to_gcs에서 실패 처리)
+        for p in range(num_partitions):
+            if partition_rows[p] == 0:
+                continue
+
+            partition_path = os.path.join(partition_dir, f"part-{p:04d}.parquet")
+            df = pd.read_parquet(partition_path, engine='pyarrow')
+            os.remove(partition_path)
+            logger.info(f"   파티션 {p + 1}/{num_partitions}: {len(df):,}행")
+
+            if prepare_func is not None:
+                df = prepare_func(df)
+            if len(df) == 0:
+                continue
+
+            df_clean = preprocess_func(df, allow_empty=True)
+            del df
+            if len(df_clean) == 0:
+                continue
+            yield _to_arrow(df_clean, input_schema)
+
+    finally:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+
+# 사용 예시
+if __name__ == "__main__":
+    from load_data import load_parquet_metadata
+
+    try:
+        metadata = load_parquet_metadata('hackle_events', 'hackle')
+        plan = plan_table_execution('hackle_events', metadata)
+        print(f"실행 계획: {plan}")
+    except Exception as e:
+        print(f"테스트 실패: {e}")
@@ -0,0 +1,117 @@
+"""
+차단 관계 투표 플래그 - (user_id, block_user_id) 쌍을 uint64 키로 묶어 정렬 후 탐색
+담당: 진우형
+"""
+
+import numpy as np
+import pyarrow as pa
+import logging
+
+from load_data import open_parquet_file
+from save_data import save_batches_to_gcs
+from sampling import sample_output_dataset
+
+logger = logging.getLogger(__name__)
+
+# 사용자 ID는 32비트 범위 안이어야 (상위 32비트, 하위 32비트) 한 키로 묶을 수 있음
+MAX_PACKED_ID = 2**32 - 1
+
+
+def pack_pair_keys(left_ids: np.ndarray, right_ids: np.ndarray) -> np.ndarray:
+    """(left, right) 사용자 ID 쌍을 uint64 키 하나로 변환: left << 32 | right"""
+    left_ids = np.asarray(left_ids, dtype=np.int64)
+    right_ids = np.asarray(right_ids, dtype=np.int64)
+
+    for ids in (left_ids, right_ids):
+        if len(ids) > 0 and (ids.min() < 0 or ids.max() > MAX_PACKED_ID):
+            raise ValueError(f"사용자 ID가 32비트 범위를 벗어남: {ids.min()} ~ {ids.max()}")
+
+    return (left_ids.astype(np.uint64) << np.uint64(32)) | right_ids.astype(np.uint64)
+
+
+def build_block_pair_index(user_ids: np.ndarray, block_user_ids: np.ndarray) -> np.ndarray:
+    """차단 쌍 인덱스 생성 - 양방향 키를 정렬·중복 제거한 uint64 배열
+
+    A가 B를 차단했든 B가 A를 차단했든 두 사용자 사이의 투표는 모두 차단 쌍으로 본다.
+    """
+    keys = np.concatenate([
+        pack_pair_keys(user_ids, block_user_ids),
+        pack_pair_keys(block_user_ids, user_ids)
+    ])
+    return np.unique(keys)
+
+
+def is_blocked_pair(block_index: np.ndarray, user_ids: np.ndarray, chosen_user_ids: np.ndarray) -> np.ndarray:
+    """투표 (user_id, chosen_user_id) 쌍이 차단 쌍 인덱스에 있는지 벡터화 탐색"""
+    keys = pack_pair_keys(user_ids, chosen_user_ids)
+    if len(block_index) == 0:
+        return np.zeros(len(keys), dtype=bool)
+
+    positions = np.searchsorted(block_index, keys)
+    positions[positions == len(block_index)] = 0
+    return block_index[positions] == keys
+
+
+def flag_blocked_votes(batch_rows: int = 1_000_000, sample_rate: float = None) -> dict:
+    """전처리된 투표 기록에 is_blocked_pair 플래그를 추가해 저장 (투표는 배치 단위 한 번만 읽음)
+
+    sample_rate를 지정하면 같은 비율의 샘플 전처리 결과를 읽고 샘플 결과 위치에 저장
+    """
+
+    logger.info("🔧 진우형: 차단 관계 투표 플래그 생성 시작...")
+    dataset = sample_output_dataset(sample_rate)
+
+    try:
+        # 1. 차단 쌍 인덱스 (필요한 두 컬럼만 로드)
+        with open_parquet_file('accounts_blockrecord_processed', dataset) as parquet_file:
+            blocks = parquet_file.read(columns=['user_id', 'block_user_id'])
+
+        block_index = build_block_pair_index(
+            blocks.column('user_id').to_numpy(),
+            blocks.column('block_user_id').to_numpy()
+        )
+        del blocks
+        logger.info(f"   차단 쌍 인덱스: {len(block_index):,}개 키 ({block_index.nbytes / 1024**2:.1f}MB)")
+
+        # 2. 투표 스트리밍 탐색
+        flag_counts = {'votes': 0, 'blocked': 0}
+
+        def flagged_batches():
+            with open_parquet_file('accounts_userquestionrecord_processed', dataset) as parquet_file:
+                for batch in parquet_file.iter_batches(batch_size=batch_rows):
+                    flags = is_blocked_pair(
+                        block_index,
+                        batch.column('user_id').fill_null(0).to_numpy(),
+                        batch.column('chosen_user_id').fill_null(0).to_numpy()
+                    )
+                    flag_counts['votes'] += len(flags)
+                    flag_counts['blocked'] += int(flags.sum())
+
+                    table = pa.Table.from_batches([batch])
+                    yield table.append_column('is_blocked_pair', pa.array(flags))
+
+        result = save_batches_to_gcs(
+            flagged_batches(),
+            'accounts_userquestionrecord_block_flagged',
+            dataset,
+            suffix=''
+        )
+
+        blocked_rate = flag_counts['blocked'] / flag_counts['votes'] * 100 if flag_counts['votes'] > 0 else 0
+        logger.info(f"✅ 진우형: 차단 관계 투표 플래그 완료")
+        logger.info(f"   차단 쌍 투표: {flag_counts['blocked']:,}건 ({blocked_rate:.3f}%)")
+        logger.info(f"   총 투표 데이터: {flag_counts['votes']:,}건")
+
+        return result
+
+    except Exception as e:
+        logger.error(f"❌ 진우형: 차단 관계 투표 플래그 실패 - {str(e)}")
+        raise
+
+# 사용 예시
+if __name__ == "__main__":
+    try:
+        result = flag_blocked_votes()
+        print(f"플래그 생성 완료: {result}")
+    except Exception as e:
+        print(f"테스트 실패: {e}")
@@ -4,8 +4,11 @@
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import logging
+from contextlib import contextmanager
 from google.cloud import storage
 from google.oauth2 import service_account
 
@@ -32,8 +35,13 @@ def setup_gcs_auth():
         logger.error(f"❌ GCS 인증 설정 실패: {e}")
         raise
 
-def load_table(table_name: str, dataset: str = 'votes') -> pd.DataFrame:
-    """GCS에서 테이블 로드 (개선 버전)"""
+def load_table(table_name: str, dataset: str = 'votes', memory_guard: bool = True,
+               sample_rate: float = None) -> pd.DataFrame:
+    """GCS에서 테이블 로드 (개선 버전)
+
+    memory_guard=False는 실행 계획에서 이미 메모리 예산을 확인한 경우에 사용
+    sample_rate를 지정하면 사용자 해시 샘플만 parquet 읽기 필터로 로드
+    """
     
     setup_gcs_auth()
     
@@ -51,7 +59,7 @@ def load_table(table_name: str, dataset: str = 'votes') -> pd.DataFrame:
         memory_before = psutil.virtual_memory().percent
         logger.info(f"   메모리 사용률 (로드 전): {memory_before:.1f}%")
         
-        if memory_before > 85:
+        if memory_guard and memory_before > 85:
             raise MemoryError(f"메모리 부족 위험: {memory_before:.1f}% 사용 중")
         
         # 파일 존재 확인
@@ -70,9 +78,16 @@ def load_table(table_name: str, dataset: str = 'votes') -> pd.DataFrame:
         if file_size_mb > 1000:  # 1GB 이상이면 경고
             logger.warning(f"⚠️ 큰 파일 감지: {file_size_mb:.1f}MB - 로딩에 시간이 걸릴 수 있습니다")
         
+        # 샘플링 필터 (parquet 스캔 단계에서 적용)
+        filters = None
+        if sample_rate is not None:
+            from sampling import get_sample_filters
+            filters = get_sample_filters(table_name, sample_rate)
+            logger.info(f"   샘플링: {sample_rate * 100:g}% 사용자")
+        
         # pandas로 직접 로드 (gcsfs 사용)
         try:
-            df = pd.read_parquet(gcs_path, engine='pyarrow')
+            df = pd.read_parquet(gcs_path, engine='pyarrow', filters=filters)
         except ImportError:
             # gcsfs가 없으면 로컬 다운로드 후 로드
             logger.info("   gcsfs 미설치 - 로컬 다운로드 방식 사용")
@@ -80,7 +95,7 @@ def load_table(table_name: str, dataset: str = 'votes') -> pd.DataFrame:
             
             try:
                 blob.download_to_filename(local_path)
-                df = pd.read_parquet(local_path, engine='pyarrow')
+                df = pd.read_parquet(local_path, engine='pyarrow', filters=filters)
             finally:
                 if os.path.exists(local_path):
                     os.remove(local_path)
@@ -102,6 +117,73 @@ def load_table(table_name: str, dataset: str = 'votes') -> pd.DataFrame:
         logger.error(f"❌ {table_name} 로드 실패: {e}")
         raise
 
+def load_parquet_metadata(table_name: str, dataset: str = 'votes') -> pq.FileMetaData:
+    """GCS parquet 파일의 footer(스키마/row group 통계/행 수)만 읽기 - 본문 다운로드 없음"""
+
+    setup_gcs_auth()
+
+    bucket_name = 'sprintda05_final_project'
+    blob_path = f"{dataset}/{table_name}.parquet"
+    gcs_path = f"gs://{bucket_name}/{blob_path}"
+
+    client = storage.Client()
+    bucket = client.bucket(bucket_name)
+    blob = bucket.get_blob(blob_path)
+
+    if blob is None:
+        raise FileNotFoundError(f"GCS 파일을 찾을 수 없습니다: {gcs_path}")
+
+    # parquet 파일 끝 8바이트 = footer 길이(4바이트, little endian) + 'PAR1'
+    tail = blob.download_as_bytes(start=blob.size - 8, end=blob.size - 1)
+    if tail[4:] != b'PAR1':
+        raise ValueError(f"parquet 파일 형식이 아닙니다: {gcs_path}")
+
+    footer_length = int.from_bytes(tail[:4], 'little')
+    footer = blob.download_as_bytes(start=blob.size - 8 - footer_length, end=blob.size - 9)
+
+    # footer만으로 최소 parquet 버퍼를 구성해 메타데이터 파싱
+    metadata = pq.read_metadata(pa.BufferReader(b'PAR1' + footer + tail))
+    logger.info(f"   {table_name} 메타데이터: {metadata.num_rows:,}행, row group {metadata.num_row_groups}개 "
+                f"(footer {footer_length / 1024:.1f}KB)")
+
+    return metadata
+
+@contextmanager
+def open_parquet_file(table_name: str, dataset: str = 'votes'):
+    """GCS parquet 파일을 ParquetFile로 열기 (row group / 배치 단위 스트리밍 읽기용)"""
+
+    setup_gcs_auth()
+
+    bucket_name = 'sprintda05_final_project'
+    blob_path = f"{dataset}/{table_name}.parquet"
+    gcs_path = f"gs://{bucket_name}/{blob_path}"
+    local_path = None
+
+    try:
+        try:
+            import gcsfs
+            fs = gcsfs.GCSFileSystem()
+            if not fs.exists(gcs_path):
+                raise FileNotFoundError(f"GCS 파일을 찾을 수 없습니다: {gcs_path}")
+            source = fs.open(gcs_path, 'rb')
+        except ImportError:
+            # gcsfs가 없으면 로컬 다운로드 후 열기
+            logger.info("   gcsfs 미설치 - 로컬 다운로드 방식 사용")
+            client = storage.Client()
+            blob = client.bucket(bucket_name).blob(blob_path)
+            if not blob.exists():
+                raise FileNotFoundError(f"GCS 파일을 찾을 수 없습니다: {gcs_path}")
+            local_path = f"/tmp/{table_name}_{dataset}_{os.getpid()}_stream.parquet"
+            blob.download_to_filename(local_path)
+            source = open(local_path, 'rb')
+
+        with source:
+            yield pq.ParquetFile(source)
+
+    finally:
+        if local_path and os.path.exists(local_path):
+            os.remove(local_path)
+
 # 사용 예시
 if __name__ == "__main__":
     # 테스트 실행
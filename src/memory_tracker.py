@@ -0,0 +1,129 @@
+"""
+단계별 최대 메모리 측정 (tracemalloc + arrow 메모리 풀 + RSS 샘플링)
+담당: 김재문
+"""
+
+import tracemalloc
+import threading
+import time
+import logging
+from contextlib import contextmanager
+import psutil
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# RSS / arrow 할당량 샘플링 주기 (초)
+SAMPLE_INTERVAL_SECONDS = 0.05
+
+_enabled = False
+_stack = []
+_report = []
+_lock = threading.Lock()
+_process = psutil.Process()
+
+
+def _sample_peaks():
+    """현재 RSS / arrow 할당량을 진행 중인 모든 단계의 peak에 반영"""
+    rss = _process.memory_info().rss
+    arrow = pa.total_allocated_bytes()
+    with _lock:
+        for frame in _stack:
+            frame['rss_peak'] = max(frame['rss_peak'], rss)
+            frame['arrow_peak'] = max(frame['arrow_peak'], arrow)
+
+
+def _sampler_loop():
+    while True:
+        time.sleep(SAMPLE_INTERVAL_SECONDS)
+        if _stack:
+            _sample_peaks()
+
+
+def enable_memory_tracking():
+    """메모리 측정 활성화 (tracemalloc은 할당마다 비용이 있으므로 필요할 때만 켬)
+
+    tracemalloc / RSS는 프로세스 전체 값이므로 단일 스레드 실행에서만 단계별로 구분된다.
+    """
+    global _enabled
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not _enabled:
+        # arrow 버퍼(parquet 읽기/쓰기, Table 변환)는 tracemalloc에 보이지 않으므로 별도 샘플링
+        threading.Thread(target=_sampler_loop, name='memory-sampler', daemon=True).start()
+    _enabled = True
+
+
+def is_memory_tracking_enabled() -> bool:
+    return _enabled
+
+
+def _propagate_peak():
+    """바깥 단계들에 현재까지의 tracemalloc peak 반영 (안쪽 단계가 reset_peak 하기 전에 호출)"""
+    _, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        for frame in _stack:
+            frame['python_peak'] = max(frame['python_peak'], peak)
+
+
+@contextmanager
+def track_memory(step_name: str):
+    """with 블록 동안의 최대 메모리 증가량(peak - 시작 시점) 기록
+
+    - python_peak_delta_mb: tracemalloc (numpy/pandas 버퍼, 파이썬 객체)
+    - arrow_peak_delta_mb: arrow 메모리 풀 (parquet 읽기/쓰기, Table 변환/정렬)
+    - rss_peak_delta_mb: 프로세스 RSS 샘플링 (SAMPLE_INTERVAL_SECONDS 주기, 짧은 순간 peak는 누락 가능)
+    - peak_delta_mb: 위 세 값 중 최대
+    """
+
+    if not _enabled:
+        yield
+        return
+
+    _propagate_peak()
+    python_before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    rss_before = _process.memory_info().rss
+    arrow_before = pa.total_allocated_bytes()
+    arrow_max_before = pa.default_memory_pool().max_memory()
+
+    frame = {'python_peak': python_before, 'rss_peak': rss_before, 'arrow_peak': arrow_before}
+    with _lock:
+        _stack.append(frame)
+
+    try:
+        yield
+    finally:
+        _propagate_peak()
+        _sample_peaks()
+        with _lock:
+            _stack.pop()
+        # 샘플링 사이의 짧은 arrow peak: 풀 최대치가 이 단계에서 갱신되었다면 그 값이 단계 peak
+        arrow_max_after = pa.default_memory_pool().max_memory()
+        if arrow_max_after > arrow_max_before:
+            frame['arrow_peak'] = max(frame['arrow_peak'], arrow_max_after)
+        python_after, _ = tracemalloc.get_traced_memory()
+
+        to_mb = lambda n: round(n / 1024**2, 1)
+        record = {
+            'step': step_name,
+            'python_peak_delta_mb': to_mb(frame['python_peak'] - python_before),
+            'arrow_peak_delta_mb': to_mb(frame['arrow_peak'] - arrow_before),
+            'rss_peak_delta_mb': to_mb(frame['rss_peak'] - rss_before),
+            'retained_delta_mb': to_mb(python_after - python_before + pa.total_allocated_bytes() - arrow_before),
+            'rss_delta_mb': to_mb(_process.memory_info().rss - rss_before)
+        }
+        record['peak_delta_mb'] = max(record['python_peak_delta_mb'], record['arrow_peak_delta_mb'],
+                                      record['rss_peak_delta_mb'])
+        _report.append(record)
+
+        logger.info(f"   📏 [{step_name}] 최대 증가 {record['peak_delta_mb']:,}MB "
+                    f"(python {record['python_peak_delta_mb']:,}MB, arrow {record['arrow_peak_delta_mb']:,}MB, "
+                    f"RSS {record['rss_peak_delta_mb']:,}MB), 유지 {record['retained_delta_mb']:,}MB")
+
+
+def pop_memory_report() -> list:
+    """지금까지의 단계별 측정 결과를 반환하고 초기화"""
+    report = list(_report)
+    _report.clear()
+    return report
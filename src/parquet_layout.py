@@ -0,0 +1,232 @@
+"""
+parquet 저장 레이아웃 프로파일 (정렬 키 / row group 크기 / 압축 / 인코딩)
+담당: 김호재
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 기존 save_to_gcs 동작 (pyarrow 기본값 + snappy) - 벤치마크 비교 기준
+BASELINE_PROFILE = {
+    'sort_by': [],
+    'row_group_size': None,
+    'compression': 'snappy',
+    'compression_level': None,
+    'use_dictionary': True,
+    'write_statistics': True,
+    'write_page_index': False
+}
+
+# 테이블별 읽기 최적화 레이아웃
+# - sort_by: 하위 필터 컬럼 순으로 정렬해야 row group 통계(min/max)로 건너뛰기 가능
+# - row_group_size: 선택적 읽기 단위 (작을수록 건너뛰기 정밀, 클수록 압축/스캔 효율)
+# - use_dictionary: 카디널리티가 낮은 문자열 컬럼만 딕셔너리 인코딩
+PARQUET_LAYOUT_PROFILES = {
+    'hackle_events': {
+        'sort_by': ['event_datetime', 'session_id'],
+        'row_group_size': 500_000,
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': ['event_key', 'session_id', 'item_name', 'page_name'],
+        'write_statistics': True,
+        'write_page_index': True
+    },
+    'hackle_events_enriched': {
+        'sort_by': ['event_datetime', 'session_id'],
+        'row_group_size': 500_000,
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': ['event_key', 'session_id', 'item_name', 'page_name',
+                           'device_model', 'device_vendor', 'osname', 'language', 'versionname', 'gender'],
+        'write_statistics': True,
+        'write_page_index': True
+    },
+    'accounts_userquestionrecord': {
+        'sort_by': ['user_id', 'created_at'],
+        'row_group_size': 250_000,
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': ['status'],
+        'write_statistics': True,
+        'write_page_index': True
+    },
+    'accounts_blockrecord': {
+        'sort_by': ['user_id', 'block_user_id'],
+        'row_group_size': 100_000,
+        'compression': 'snappy',
+        'compression_level': None,
+        'use_dictionary': ['reason'],
+        'write_statistics': True,
+        'write_page_index': True
+    },
+    'user_activity_timeline': {
+        'sort_by': ['user_id', 'created_at'],
+        'row_group_size': 500_000,
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': ['source_table'],
+        'write_statistics': True,
+        'write_page_index': True
+    },
+    'accounts_user': {
+        'sort_by': ['id'],
+        'row_group_size': 200_000,
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': ['gender', 'specialist_type'],
+        'write_statistics': True,
+        'write_page_index': True
+    }
+}
+
+# 프로파일이 정의되지 않은 테이블용 기본값
+DEFAULT_PROFILE = {
+    **BASELINE_PROFILE,
+    'row_group_size': 250_000,
+    'write_page_index': True
+}
+
+
+def get_layout_profile(table_name: str) -> dict:
+    """테이블 이름으로 레이아웃 프로파일 조회 (_processed 접미사 허용)"""
+    base_name = table_name[:-len('_processed')] if table_name.endswith('_processed') else table_name
+    return PARQUET_LAYOUT_PROFILES.get(base_name, DEFAULT_PROFILE)
+
+
+def write_parquet_with_layout(df: pd.DataFrame, path: str, table_name: str, profile: dict = None) -> dict:
+    """레이아웃 프로파일에 맞춰 DataFrame을 parquet 파일로 기록"""
+
+    if profile is None:
+        profile = get_layout_profile(table_name)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # 정렬 (데이터에 없는 키는 무시)
+    sort_by = [col for col in profile['sort_by'] if col in table.column_names]
+    sorting_columns = None
+    if sort_by:
+        sort_keys = [(col, 'ascending') for col in sort_by]
+        table = table.sort_by(sort_keys)
+        sorting_columns = pq.SortingColumn.from_ordering(table.schema, sort_keys)
+
+    use_dictionary = profile['use_dictionary']
+    if isinstance(use_dictionary, list):
+        use_dictionary = [col for col in use_dictionary if col in table.column_names]
+
+    pq.write_table(
+        table,
+        path,
+        row_group_size=profile['row_group_size'],
+        compression=profile['compression'],
+        compression_level=profile['compression_level'],
+        use_dictionary=use_dictionary,
+        write_statistics=profile['write_statistics'],
+        write_page_index=profile['write_page_index'],
+        sorting_columns=sorting_columns
+    )
+
+    num_row_groups = pq.ParquetFile(path).metadata.num_row_groups
+    logger.info(f"   레이아웃: 정렬={sort_by or '없음'}, 압축={profile['compression']}, row group {num_row_groups}개")
+
+    return {
+        'sort_by': sort_by,
+        'compression': profile['compression'],
+        'row_groups': num_row_groups
+    }
+
+
+def parquet_writer_options(schema: pa.Schema, table_name: str, presorted: bool = False) -> dict:
+    """스트리밍 저장(ParquetWriter)용 레이아웃 옵션
+
+    배치 단위 기록에서는 전체 정렬이 불가능하므로, 입력이 이미 정렬 키 순서로
+    들어오는 경우(presorted=True)에만 정렬 메타데이터를 기록한다.
+    """
+
+    profile = get_layout_profile(table_name)
+
+    use_dictionary = profile['use_dictionary']
+    if isinstance(use_dictionary, list):
+        use_dictionary = [col for col in use_dictionary if col in schema.names]
+
+    sort_by = [col for col in profile['sort_by'] if col in schema.names]
+    sorting_columns = None
+    if presorted and sort_by:
+        sorting_columns = pq.SortingColumn.from_ordering(schema, [(col, 'ascending') for col in sort_by])
+
+    return {
+        'compression': profile['compression'],
+        'compression_level': profile['compression_level'],
+        'use_dictionary': use_dictionary,
+        'write_statistics': profile['write_statistics'],
+        'write_page_index': profile['write_page_index'],
+        'sorting_columns': sorting_columns
+    }
+
+
+def benchmark_layout_profiles(df: pd.DataFrame, table_name: str, filter_column: str,
+                              profiles: dict = None, n_probes: int = 5) -> pd.DataFrame:
+    """프로파일별 쓰기 시간 / 파일 크기 / 선택적 읽기 속도 측정"""
+
+    if filter_column not in df.columns:
+        raise ValueError(f"필터 컬럼 누락: {filter_column}")
+
+    if profiles is None:
+        profiles = {
+            'baseline': BASELINE_PROFILE,
+            'tuned': get_layout_profile(table_name)
+        }
+
+    probe_values = df[filter_column].dropna().sample(
+        n=min(n_probes, df[filter_column].notna().sum()), random_state=42
+    ).tolist()
+
+    results = []
+    for profile_name, profile in profiles.items():
+        local_path = f"/tmp/{table_name}_{profile_name}_{os.getpid()}.parquet"
+
+        try:
+            start_time = time.time()
+            write_parquet_with_layout(df, local_path, table_name, profile)
+            write_seconds = time.time() - start_time
+
+            file_size_mb = os.path.getsize(local_path) / 1024**2
+
+            # 선택적 읽기: 필터 값 하나씩 조회 (row group 통계로 건너뛰기)
+            start_time = time.time()
+            matched_rows = 0
+            for value in probe_values:
+                matched_rows += pq.read_table(local_path, filters=[(filter_column, '==', value)]).num_rows
+            read_seconds = (time.time() - start_time) / max(len(probe_values), 1)
+
+            results.append({
+                'profile': profile_name,
+                'write_seconds': round(write_seconds, 3),
+                'file_size_mb': round(file_size_mb, 2),
+                'selective_read_seconds': round(read_seconds, 4),
+                'matched_rows': matched_rows
+            })
+
+            logger.info(f"   [{profile_name}] 쓰기 {write_seconds:.2f}초, {file_size_mb:.1f}MB, "
+                        f"선택적 읽기 {read_seconds:.3f}초/건")
+        finally:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+
+    return pd.DataFrame(results)
+
+# 사용 예시
+if __name__ == "__main__":
+    from load_data import load_table
+
+    try:
+        df = load_table('hackle_events', 'hackle')
+        report = benchmark_layout_profiles(df, 'hackle_events', filter_column='session_id')
+        print(report.to_string(index=False))
+    except Exception as e:
+        print(f"테스트 실패: {e}")
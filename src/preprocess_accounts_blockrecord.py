@@ -5,12 +5,16 @@ accounts_blockrecord 전처리
 
 import pandas as pd
 import logging
-import gc
+
+from memory_tracker import track_memory
 
 logger = logging.getLogger(__name__)
 
-def preprocess_blockrecord(df: pd.DataFrame) -> pd.DataFrame:
-    """blockrecord 전처리: 자기 자신 차단 제거 (개선 버전)"""
+def preprocess_blockrecord(df: pd.DataFrame, allow_empty: bool = False) -> pd.DataFrame:
+    """blockrecord 전처리: 자기 자신 차단 제거 (개선 버전)
+
+    allow_empty=True: 배치 단위 실행 시 결과가 비어도 실패로 보지 않음
+    """
 
     logger.info("🔧 이준희: accounts_blockrecord 전처리 시작...")
     
@@ -23,11 +27,13 @@ def preprocess_blockrecord(df: pd.DataFrame) -> pd.DataFrame:
         if missing_columns:
             raise ValueError(f"필수 컬럼 누락: {missing_columns}")
 
-        # 자기 자신 차단 식별 및 제거
-        self_blocks = df['user_id'] == df['block_user_id']
-        self_block_count = self_blocks.sum()
+        # 자기 자신 차단 식별 및 제거 (boolean mask 한 번으로 선택 - 추가 .copy() 없음)
+        with track_memory('blockrecord: 자기 차단 제거'):
+            self_blocks = df['user_id'] == df['block_user_id']
+            self_block_count = self_blocks.sum()
 
-        df_clean = df[~self_blocks].copy()
+            df_clean = df[~self_blocks]
+            del self_blocks
         
         removal_rate = self_block_count / original_count * 100 if original_count > 0 else 0
 
@@ -36,18 +42,13 @@ def preprocess_blockrecord(df: pd.DataFrame) -> pd.DataFrame:
         logger.info(f"   최종 데이터: {len(df_clean):,}건")
         
         # 결과 검증
-        if len(df_clean) == 0 and original_count > 0:
+        if len(df_clean) == 0 and original_count > 0 and not allow_empty:
             raise ValueError("전처리 후 데이터가 비어있습니다")
         
-        # 메모리 정리
-        del df
-        gc.collect()
-
         return df_clean
         
     except Exception as e:
         logger.error(f"❌ 이준희: blockrecord 전처리 실패 - {str(e)}")
-        gc.collect()
         raise
 
 # 사용 예시
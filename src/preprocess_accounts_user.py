@@ -4,9 +4,11 @@ accounts_user 전처리
 """
 
 import pandas as pd
+import numpy as np
 import ast
 import logging
-import gc
+
+from memory_tracker import track_memory
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +44,8 @@ def preprocess_accounts_user(df: pd.DataFrame) -> pd.DataFrame:
                 return []
 
         logger.info("   친구 수 계산 중...")
-        df['friend_count'] = df['friend_id_list'].apply(parse_list).apply(len)
+        with track_memory('accounts_user: 친구 수 계산'):
+            df['friend_count'] = df['friend_id_list'].apply(lambda x: len(parse_list(x)))
         
         # 기본 통계 정보
         logger.info(f"   포인트 통계: min={df['point'].min()}, max={df['point'].max()}, mean={df['point'].mean():.1f}")
@@ -63,24 +66,23 @@ def preprocess_accounts_user(df: pd.DataFrame) -> pd.DataFrame:
         logger.info(f"      친구수 >= {friend_specialist_threshold:.1f}")
 
         # Specialist 분류 컬럼 생성
-        df['is_point_specialist'] = df['point'] >= point_specialist_threshold
-        df['is_friend_specialist'] = df['friend_count'] >= friend_specialist_threshold
-        
-        # 종합 specialist 여부 (포인트 또는 친구수 중 하나라도 specialist면 True)
-        df['is_specialist'] = df['is_point_specialist'] | df['is_friend_specialist']
-        
-        # Specialist 유형 분류
-        def classify_specialist_type(row):
-            if row['is_point_specialist'] and row['is_friend_specialist']:
-                return 'both'  # 포인트와 친구수 모두 높음
-            elif row['is_point_specialist']:
-                return 'point'  # 포인트만 높음
-            elif row['is_friend_specialist']:
-                return 'friend'  # 친구수만 높음
-            else:
-                return 'normal'  # 일반 사용자
-        
-        df['specialist_type'] = df.apply(classify_specialist_type, axis=1)
+        with track_memory('accounts_user: specialist 플래그'):
+            df['is_point_specialist'] = df['point'] >= point_specialist_threshold
+            df['is_friend_specialist'] = df['friend_count'] >= friend_specialist_threshold
+            
+            # 종합 specialist 여부 (포인트 또는 친구수 중 하나라도 specialist면 True)
+            df['is_specialist'] = df['is_point_specialist'] | df['is_friend_specialist']
+        
+        # Specialist 유형 분류 (행 단위 apply 대신 boolean mask로 벡터화)
+        with track_memory('accounts_user: specialist 유형'):
+            is_point = df['is_point_specialist'].to_numpy()
+            is_friend = df['is_friend_specialist'].to_numpy()
+            df['specialist_type'] = np.select(
+                [is_point & is_friend, is_point, is_friend],
+                ['both', 'point', 'friend'],  # 모두 높음 / 포인트만 / 친구수만
+                default='normal'  # 일반 사용자
+            ).astype(object)
+            del is_point, is_friend
 
         # 통계 정보 출력
         total_specialists = df['is_specialist'].sum()
@@ -108,27 +110,22 @@ def preprocess_accounts_user(df: pd.DataFrame) -> pd.DataFrame:
         if len(df) == 0:
             raise ValueError("전처리 후 데이터가 비어있습니다")
         
-        # Specialist들의 평균 통계
+        # Specialist들의 평균 통계 (부분 DataFrame 생성 없이 groupby 집계)
         if total_specialists > 0:
-            specialist_df = df[df['is_specialist']]
-            normal_df = df[~df['is_specialist']]
+            group_means = df.groupby('is_specialist')[['point', 'friend_count']].mean().reindex([True, False])
             
             logger.info(f"   Specialist vs 일반 사용자 비교:")
-            logger.info(f"      Specialist 평균 포인트: {specialist_df['point'].mean():.1f}")
-            logger.info(f"      일반 사용자 평균 포인트: {normal_df['point'].mean():.1f}")
-            logger.info(f"      Specialist 평균 친구수: {specialist_df['friend_count'].mean():.1f}")
-            logger.info(f"      일반 사용자 평균 친구수: {normal_df['friend_count'].mean():.1f}")
+            logger.info(f"      Specialist 평균 포인트: {group_means.loc[True, 'point']:.1f}")
+            logger.info(f"      일반 사용자 평균 포인트: {group_means.loc[False, 'point']:.1f}")
+            logger.info(f"      Specialist 평균 친구수: {group_means.loc[True, 'friend_count']:.1f}")
+            logger.info(f"      일반 사용자 평균 친구수: {group_means.loc[False, 'friend_count']:.1f}")
         
         logger.info(f"   최종 데이터: {len(df):,}명 (데이터 제거 없음)")
-        
-        # 메모리 정리 (원본 데이터는 제거하지 않고 임시 변수만 정리)
-        gc.collect()
 
         return df
         
     except Exception as e:
         logger.error(f"❌ 천지현: accounts_user 전처리 실패 - {str(e)}")
-        gc.collect()
         raise
 
 # 사용 예시
@@ -5,12 +5,16 @@ accounts_userquestionrecord 전처리
 
 import pandas as pd
 import logging
-import gc
+
+from memory_tracker import track_memory
 
 logger = logging.getLogger(__name__)
 
-def preprocess_userquestionrecord(df: pd.DataFrame) -> pd.DataFrame:
-    """userquestionrecord 전처리: 자기 투표를 '자기 사랑' 플래그로 처리 (개선 버전)"""
+def preprocess_userquestionrecord(df: pd.DataFrame, allow_empty: bool = False) -> pd.DataFrame:
+    """userquestionrecord 전처리: 자기 투표를 '자기 사랑' 플래그로 처리 (개선 버전)
+
+    allow_empty=True: 배치 단위 실행 시 결과가 비어도 실패로 보지 않음
+    """
 
     logger.info("🔧 진우형: accounts_userquestionrecord 전처리 시작...")
     
@@ -23,8 +27,9 @@ def preprocess_userquestionrecord(df: pd.DataFrame) -> pd.DataFrame:
         if missing_columns:
             raise ValueError(f"필수 컬럼 누락: {missing_columns}")
 
-        # 자기 자신 투표 플래그 생성
-        df['is_self_love'] = df['user_id'] == df['chosen_user_id']
+        # 자기 자신 투표 플래그 생성 (컬럼 추가만 - 기존 데이터 복사 없음)
+        with track_memory('userquestionrecord: 자기 사랑 플래그'):
+            df['is_self_love'] = df['user_id'] == df['chosen_user_id']
 
         self_vote_count = df['is_self_love'].sum()
         self_vote_rate = self_vote_count / len(df) * 100
@@ -34,17 +39,13 @@ def preprocess_userquestionrecord(df: pd.DataFrame) -> pd.DataFrame:
         logger.info(f"   총 투표 데이터: {len(df):,}건")
         
         # 결과 검증
-        if len(df) == 0:
+        if len(df) == 0 and not allow_empty:
             raise ValueError("전처리 후 데이터가 비어있습니다")
         
-        # 메모리 정리
-        gc.collect()
-
         return df
         
     except Exception as e:
         logger.error(f"❌ 진우형: userquestionrecord 전처리 실패 - {str(e)}")
-        gc.collect()
         raise
 
 # 사용 예시
@@ -5,12 +5,16 @@ hackle_events 전처리
 
 import pandas as pd
 import logging
-import gc
+
+from memory_tracker import track_memory
 
 logger = logging.getLogger(__name__)
 
-def preprocess_hackle_events(df: pd.DataFrame) -> pd.DataFrame:
-    """hackle_events 전처리: 중복 이벤트 제거 + 불필요 이벤트 삭제 (개선 버전)"""
+def preprocess_hackle_events(df: pd.DataFrame, allow_empty: bool = False) -> pd.DataFrame:
+    """hackle_events 전처리: 중복 이벤트 제거 + 불필요 이벤트 삭제 (개선 버전)
+
+    allow_empty=True: 파티션 단위 실행 시 결과가 비어도 실패로 보지 않음
+    """
 
     logger.info("🔧 조수진: hackle_events 전처리 시작...")
     
@@ -34,22 +38,29 @@ def preprocess_hackle_events(df: pd.DataFrame) -> pd.DataFrame:
             excluded_counts[event] = count
             logger.info(f"   삭제 대상 '{event}': {count:,}건")
         
-        # 필터링 실행
-        df_filtered = df[~df['event_key'].isin(exclude_events)].copy()
-        after_filter_count = len(df_filtered)
+        # 필터링 대상 mask (중간 DataFrame 생성 없음)
+        with track_memory('hackle_events: 이벤트 필터 mask'):
+            keep_mask = ~df['event_key'].isin(exclude_events)
+        after_filter_count = int(keep_mask.sum())
         
         filtered_out = before_filter_count - after_filter_count
         logger.info(f"   이벤트 필터링: {filtered_out:,}건 삭제 ({filtered_out/before_filter_count*100:.2f}%)")
 
-        # 2. 중복 제거 전 분석
+        # 2. 중복 검사 - 중복 키에 event_key가 포함되므로 삭제 이벤트의 중복은 항상 삭제 이벤트끼리만 발생
+        #    → 전체 데이터의 duplicated와 필터 mask 조합이 필터 후 drop_duplicates와 동일
         logger.info(f"   중복 검사 기준: {required_columns}")
-        duplicate_check = df_filtered.duplicated(subset=required_columns)
+        with track_memory('hackle_events: 중복 mask'):
+            duplicate_check = df.duplicated(subset=required_columns, keep='first') & keep_mask
         duplicate_count = duplicate_check.sum()
         logger.info(f"   발견된 중복: {duplicate_count:,}건")
 
-        # 3. 중복 제거 (session_id, event_datetime, event_key 기준)
-        before_count = len(df_filtered)
-        df_clean = df_filtered.drop_duplicates(subset=required_columns, keep='first')
+        # 3. 필터 + 중복 제거를 mask 한 번으로 적용 (session_id, event_datetime, event_key 기준)
+        before_count = after_filter_count
+        with track_memory('hackle_events: mask 적용'):
+            keep_mask &= ~duplicate_check
+            del duplicate_check
+            df_clean = df[keep_mask]
+            del keep_mask
         after_count = len(df_clean)
 
         removed = before_count - after_count
@@ -62,7 +73,7 @@ def preprocess_hackle_events(df: pd.DataFrame) -> pd.DataFrame:
         logger.info(f"   총 제거율: {(original_count-after_count)/original_count*100:.2f}%")
         
         # 결과 검증
-        if len(df_clean) == 0:
+        if len(df_clean) == 0 and not allow_empty:
             raise ValueError("전처리 후 데이터가 비어있습니다")
         
         # 최종 이벤트 종류 확인
@@ -70,15 +81,10 @@ def preprocess_hackle_events(df: pd.DataFrame) -> pd.DataFrame:
         logger.info(f"   최종 이벤트 종류: {len(final_events)}개")
         logger.info(f"   상위 5개 이벤트: {final_events.head().to_dict()}")
         
-        # 메모리 정리
-        del df, df_filtered
-        gc.collect()
-
         return df_clean
         
     except Exception as e:
         logger.error(f"❌ 조수진: hackle_events 전처리 실패 - {str(e)}")
-        gc.collect()
         raise
 
 # 사용 예시
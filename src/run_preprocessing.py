@@ -14,12 +14,19 @@ import psutil
 # 현재 디렉토리를 파이썬 경로에 추가
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from load_data import load_table
+from load_data import load_table, load_parquet_metadata
 from preprocess_accounts_user import preprocess_accounts_user
 from preprocess_hackle_events import preprocess_hackle_events
 from preprocess_accounts_userquestionrecord import preprocess_userquestionrecord
 from preprocess_accounts_blockrecord import preprocess_blockrecord
-from save_data import save_to_gcs
+from save_data import save_to_gcs, save_batches_to_gcs
+from validate_data import validate_parquet_metadata, validate_dataframe
+from sampling import apply_sample_mask, sample_output_dataset
+from memory_tracker import track_memory, enable_memory_tracking, is_memory_tracking_enabled, pop_memory_report
+from execution_planner import plan_table_execution, iter_chunked_results, iter_partitioned_results
+from build_user_activity_timeline import build_user_activity_timeline
+from flag_blocked_votes import flag_blocked_votes
+from enrich_hackle_events import enrich_hackle_events
 
 # 로깅 설정
 logging.basicConfig(
@@ -32,8 +39,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def check_system_resources():
-    """시스템 리소스 체크"""
+# 전처리 결과를 입력으로 사용하는 후속 단계 (단계명: (담당자, 실행 함수))
+PIPELINE_STAGES = {
+    'user_activity_timeline': ('조수진', build_user_activity_timeline),
+    'block_vote_flag': ('진우형', flag_blocked_votes),
+    'hackle_enrichment': ('조수진', enrich_hackle_events)
+}
+
+def check_system_resources(raise_on_memory: bool = True):
+    """시스템 리소스 체크 (raise_on_memory=False면 메모리는 실행 계획에서 처리)"""
     memory_percent = psutil.virtual_memory().percent
     cpu_percent = psutil.cpu_percent(interval=1)
     disk_percent = psutil.disk_usage('/tmp').percent
@@ -43,7 +57,7 @@ def check_system_resources():
     logger.info(f"   CPU: {cpu_percent:.1f}%")
     logger.info(f"   디스크(/tmp): {disk_percent:.1f}%")
     
-    if memory_percent > 90:
+    if memory_percent > 90 and raise_on_memory:
         raise MemoryError(f"메모리 사용률 위험 수준: {memory_percent:.1f}%")
     if disk_percent > 90:
         raise RuntimeError(f"디스크 공간 부족: {disk_percent:.1f}%")
@@ -54,30 +68,70 @@ def check_system_resources():
         'disk': disk_percent
     }
 
-def run_single_preprocessing(processor_name: str, table_name: str, dataset: str, preprocess_func):
-    """개별 전처리 실행"""
+def run_single_preprocessing(processor_name: str, table_name: str, dataset: str, preprocess_func,
+                             sample_rate: float = None):
+    """개별 전처리 실행 (sample_rate 지정 시 사용자 해시 샘플만 처리)"""
     start_time = time.time()
     
     try:
         logger.info(f"\n🔄 {processor_name}: {table_name} 처리 시작")
         
-        # 리소스 체크
-        resources_before = check_system_resources()
+        # 리소스 체크 (메모리 부족은 실행 계획에서 느린 방식으로 전환)
+        resources_before = check_system_resources(raise_on_memory=False)
         
-        # 1. 데이터 로드
-        df = load_table(table_name, dataset)
-        original_count = len(df)
+        # 0. 계약 검증 (parquet footer만 읽어 로드 전에 실패 처리)
+        metadata = load_parquet_metadata(table_name, dataset)
+        metadata_report = validate_parquet_metadata(metadata, table_name)
         
-        # 2. 전처리
-        df_clean = preprocess_func(df)
-        processed_count = len(df_clean)
+        # 샘플 실행 결과는 운영 processed 데이터와 분리 저장
+        output_dataset = sample_output_dataset(sample_rate)
         
-        # 3. 저장
-        result = save_to_gcs(df_clean, table_name, 'processed')
+        # 원본 행 수 = 전처리에 들어간 행 수 (샘플링 시 샘플 행 수, 실행 전략과 무관)
+        original_count = 0
         
-        # 4. 메모리 정리
-        del df_clean
-        gc.collect()
+        # 실행 계획 (메타데이터 크기 vs 메모리 예산, 분할 불가 테이블이 예산 초과 시 MemoryError)
+        plan = plan_table_execution(table_name, metadata, row_fraction=sample_rate or 1.0)
+        
+        def prepare_func(df):
+            nonlocal original_count
+            # 배치/파티션 단위 실행 시 샘플링은 로드 후 mask로 적용
+            if sample_rate is not None:
+                df = apply_sample_mask(df, table_name, sample_rate)
+            # 메타데이터로 확인하지 못한 항목만 벡터화 검증
+            validate_dataframe(df, table_name, metadata_report['pending'])
+            original_count += len(df)
+            return df
+        
+        if plan['strategy'] == 'in_memory':
+            # 1. 데이터 로드 (계획 단계에서 크기 확인 완료, 샘플링은 읽기 필터로 적용)
+            #    분할 불가 테이블은 대체 실행 방식이 없으므로 로드 직전 메모리 가드 유지
+            with track_memory(f"{table_name}: 로드"):
+                df = load_table(table_name, dataset, memory_guard=plan['chunk_mode'] is None,
+                                sample_rate=sample_rate)
+                validate_dataframe(df, table_name, metadata_report['pending'])
+                original_count = len(df)
+            
+            # 2. 전처리 (입력 참조는 전처리 직후 해제)
+            with track_memory(f"{table_name}: 전처리"):
+                df_clean = preprocess_func(df)
+                del df
+            processed_count = len(df_clean)
+            
+            # 3. 저장
+            with track_memory(f"{table_name}: 저장"):
+                result = save_to_gcs(df_clean, table_name, output_dataset)
+            
+            # 4. 메모리 정리
+            del df_clean
+        else:
+            # 1~3. 배치/파티션 단위 로드 → 전처리 → 스트리밍 저장
+            iter_results = iter_chunked_results if plan['strategy'] == 'chunked' else iter_partitioned_results
+            result = save_batches_to_gcs(
+                iter_results(table_name, dataset, preprocess_func, plan, prepare_func),
+                table_name,
+                output_dataset
+            )
+            processed_count = result['rows']
         
         # 처리 시간 계산
         elapsed_time = time.time() - start_time
@@ -89,11 +143,13 @@ def run_single_preprocessing(processor_name: str, table_name: str, dataset: str,
             'original_rows': original_count,
             'processed_rows': processed_count,
             'processing_time_seconds': round(elapsed_time, 2),
+            'execution_strategy': plan['strategy'],
+            'memory_steps': pop_memory_report(),
             'status': 'SUCCESS',
             'gcs_info': result
         }
         
-        logger.info(f"✅ {processor_name}: {table_name} 완료")
+        logger.info(f"✅ {processor_name}: {table_name} 완료 ({plan['strategy']})")
         logger.info(f"   처리 시간: {elapsed_time:.1f}초")
         logger.info(f"   데이터: {original_count:,}행 → {processed_count:,}행")
         
@@ -102,6 +158,7 @@ def run_single_preprocessing(processor_name: str, table_name: str, dataset: str,
     except Exception as e:
         elapsed_time = time.time() - start_time
         logger.error(f"❌ {processor_name}: {table_name} 실패 - {str(e)}")
+        pop_memory_report()
         
         return {
             'processor': processor_name,
@@ -111,18 +168,59 @@ def run_single_preprocessing(processor_name: str, table_name: str, dataset: str,
             'error': str(e)
         }
 
-def run_all_preprocessing(parallel: bool = False):
+def run_pipeline_stage(stage_name: str, sample_rate: float = None):
+    """후속 단계 실행 (전처리 완료 데이터 기반, sample_rate 지정 시 같은 비율의 샘플 결과를 입력/출력으로 사용)"""
+    start_time = time.time()
+    processor_name, stage_func = PIPELINE_STAGES[stage_name]
+    
+    try:
+        logger.info(f"\n🔄 {processor_name}: {stage_name} 단계 시작")
+        
+        check_system_resources()
+        result = stage_func(sample_rate=sample_rate)
+        
+        elapsed_time = time.time() - start_time
+        logger.info(f"✅ {processor_name}: {stage_name} 완료 ({elapsed_time:.1f}초)")
+        
+        return {
+            'processor': processor_name,
+            'table_name': stage_name,
+            'processed_rows': result['rows'],
+            'processing_time_seconds': round(elapsed_time, 2),
+            'status': 'SUCCESS',
+            'gcs_info': result
+        }
+        
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        logger.error(f"❌ {processor_name}: {stage_name} 실패 - {str(e)}")
+        
+        return {
+            'processor': processor_name,
+            'table_name': stage_name,
+            'processing_time_seconds': round(elapsed_time, 2),
+            'status': 'FAILED',
+            'error': str(e)
+        }
+
+def run_all_preprocessing(parallel: bool = False, stages: list = None, sample_rate: float = None):
     """모든 테이블 전처리 실행"""
     
+    # 메모리 측정값(tracemalloc / arrow 풀 / RSS)은 프로세스 전체 기준이라 병렬 실행 시 테이블별 구분 불가
+    if parallel and is_memory_tracking_enabled():
+        raise ValueError("메모리 측정은 순차 처리 모드에서만 사용할 수 있습니다")
+    
     pipeline_start_time = time.time()
     
     logger.info("🚀 전체 전처리 파이프라인 시작")
     logger.info("=" * 80)
     logger.info(f"시작 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if sample_rate is not None:
+        logger.info(f"🎯 샘플링 모드: 사용자 {sample_rate * 100:g}% (결과: {sample_output_dataset(sample_rate)}/)")
     
     # 초기 리소스 체크
     try:
-        initial_resources = check_system_resources()
+        initial_resources = check_system_resources(raise_on_memory=False)
     except Exception as e:
         logger.error(f"❌ 시스템 리소스 부족으로 실행 중단: {e}")
         return
@@ -170,7 +268,8 @@ def run_all_preprocessing(parallel: bool = False):
                     task['processor'],
                     task['table_name'],
                     task['dataset'],
-                    task['function']
+                    task['function'],
+                    sample_rate
                 )
                 futures.append(future)
             
@@ -187,7 +286,8 @@ def run_all_preprocessing(parallel: bool = False):
                 task['processor'],
                 task['table_name'],
                 task['dataset'],
-                task['function']
+                task['function'],
+                sample_rate
             )
             results.append(result)
             
@@ -195,6 +295,11 @@ def run_all_preprocessing(parallel: bool = False):
             gc.collect()
             time.sleep(1)  # 시스템 안정화를 위한 짧은 대기
     
+    # 후속 단계 (전처리 결과 필요 - 순차 실행)
+    for stage_name in stages or []:
+        results.append(run_pipeline_stage(stage_name, sample_rate))
+        gc.collect()
+    
     # 전체 파이프라인 완료
     pipeline_elapsed_time = time.time() - pipeline_start_time
     
@@ -215,14 +320,21 @@ def run_all_preprocessing(parallel: bool = False):
     for result in results:
         if result['status'] == 'SUCCESS':
             logger.info(f"   ✅ {result['table_name']} ({result['processor']})")
-            logger.info(f"      {result['original_rows']:,}행 → {result['processed_rows']:,}행")
+            if 'original_rows' in result:
+                logger.info(f"      {result['original_rows']:,}행 → {result['processed_rows']:,}행")
+            else:
+                logger.info(f"      {result['processed_rows']:,}행 생성")
             logger.info(f"      처리 시간: {result['processing_time_seconds']}초")
+            if result.get('memory_steps'):
+                peak_step = max(result['memory_steps'], key=lambda step: step['peak_delta_mb'])
+                logger.info(f"      최대 메모리 증가: {peak_step['peak_delta_mb']:,}MB ({peak_step['step']})")
         else:
             logger.info(f"   ❌ {result['table_name']} ({result['processor']})")
             logger.info(f"      오류: {result['error']}")
     
     if success_count > 0:
-        logger.info(f"💾 성공한 데이터는 gs://sprintda05_final_project/processed/ 에 저장됨")
+        output_dataset = sample_output_dataset(sample_rate)
+        logger.info(f"💾 성공한 데이터는 gs://sprintda05_final_project/{output_dataset}/ 에 저장됨")
     
     # 최종 리소스 상태
     try:
@@ -241,9 +353,26 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='데이터 전처리 파이프라인 실행')
     parser.add_argument('--parallel', action='store_true', help='병렬 처리 모드 (메모리 충분할 때만)')
     parser.add_argument('--table', type=str, help='특정 테이블만 처리 (accounts_user, hackle_events, accounts_userquestionrecord, accounts_blockrecord)')
+    parser.add_argument('--copy-on-write', action='store_true', help='pandas Copy-on-Write 모드 (불필요한 복사 방지)')
+    parser.add_argument('--profile-memory', action='store_true', help='단계별 최대 메모리 증가량 측정 (tracemalloc + arrow 메모리 풀 + RSS, 순차 처리 전용)')
+    parser.add_argument('--sample-rate', type=float, help='사용자 해시 샘플링 비율 (예: 0.01 = 1%%, 모든 테이블에서 같은 사용자)')
+    parser.add_argument('--stage', type=str, action='append', choices=list(PIPELINE_STAGES.keys()),
+                        help='후속 단계만 실행 (여러 번 지정 가능, 전처리 결과가 GCS에 있어야 함 - --sample-rate 지정 시 같은 비율의 샘플 결과 사용)')
     
     args = parser.parse_args()
     
+    if args.sample_rate is not None and not 0 < args.sample_rate <= 1:
+        parser.error('--sample-rate는 0 초과 1 이하여야 합니다')
+    if args.profile_memory and args.parallel:
+        parser.error('--profile-memory는 --parallel과 함께 사용할 수 없습니다 (단계별 측정값이 섞임)')
+    
+    if args.copy_on_write:
+        import pandas as pd
+        pd.set_option('mode.copy_on_write', True)
+        logger.info("🐄 pandas Copy-on-Write 모드 활성화")
+    if args.profile_memory:
+        enable_memory_tracking()
+    
     if args.table:
         # 특정 테이블만 처리
         table_map = {
@@ -255,11 +384,16 @@ if __name__ == "__main__":
         
         if args.table in table_map:
             processor, dataset, func = table_map[args.table]
-            result = run_single_preprocessing(processor, args.table, dataset, func)
+            result = run_single_preprocessing(processor, args.table, dataset, func, args.sample_rate)
             print(f"\n결과: {result}")
         else:
             print(f"❌ 지원하지 않는 테이블: {args.table}")
             print(f"지원 테이블: {', '.join(table_map.keys())}")
+    elif args.stage:
+        # 후속 단계만 실행
+        for stage_name in args.stage:
+            result = run_pipeline_stage(stage_name, args.sample_rate)
+            print(f"\n결과: {result}")
     else:
         # 전체 파이프라인 실행
-        results = run_all_preprocessing(parallel=args.parallel)
\ No newline at end of file
+        results = run_all_preprocessing(parallel=args.parallel, sample_rate=args.sample_rate)
\ No newline at end of file
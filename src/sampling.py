@@ -0,0 +1,133 @@
+"""
+사용자 해시 기반 결정적 샘플링 (빠른 전체 파이프라인 반복 실행용)
+담당: 김재문
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# 해시 버킷 수 - sample_rate 해상도 (0.01% 단위)
+HASH_BUCKETS = 10_000
+
+# 테이블별 사용자 키 컬럼 - 키 중 하나라도 샘플 사용자면 행 유지
+# (샘플 사용자의 보낸/받은 투표, 차단한/당한 기록이 모두 남아 사용자 단위 지표가 정확함)
+# 샘플 사용자 = accounts_user의 ID 중 해시 버킷이 샘플 범위인 사용자 (get_sampled_user_ids)
+# → 읽기 필터와 배치 mask가 같은 ID 집합을 사용하므로 실행 전략과 무관하게 같은 행이 선택됨
+SAMPLE_KEYS = {
+    'accounts_user': ['id'],
+    'accounts_userquestionrecord': ['user_id', 'chosen_user_id'],
+    'accounts_blockrecord': ['user_id', 'block_user_id']
+}
+
+# hackle_events에는 사용자 컬럼이 없으므로 hackle_properties의 session_id → user_id 매핑 사용
+SESSION_SAMPLED_TABLES = ['hackle_events']
+
+
+def is_sampled_user(user_ids, sample_rate: float) -> np.ndarray:
+    """사용자 ID별 샘플 포함 여부 - 실행/테이블과 무관하게 항상 같은 결과
+
+    votes 테이블의 정수 ID와 hackle의 문자열 ID가 같은 결과를 내도록 문자열로 정규화 후 해시한다.
+    """
+    ids = pd.Series(user_ids)
+    valid = ids.notna().to_numpy()
+
+    if pd.api.types.is_numeric_dtype(ids):
+        ids = ids.astype('Int64')
+    hashes = pd.util.hash_array(ids.astype(str).to_numpy(dtype=object))
+
+    return valid & (hashes % HASH_BUCKETS < int(round(sample_rate * HASH_BUCKETS)))
+
+
+def resolve_session_properties(sessions: pd.DataFrame) -> pd.DataFrame:
+    """hackle_properties → 세션당 한 행 (컬럼별 id 순 마지막 non-null 값)
+
+    세션에 익명(user_id 결측) 기록이 로그인 기록 뒤에 있어도 알려진 사용자를 유지한다.
+    """
+    return sessions.sort_values('id').groupby('session_id', sort=False).last().reset_index()
+
+
+@lru_cache(maxsize=None)
+def get_sampled_user_ids(sample_rate: float) -> np.ndarray:
+    """accounts_user 전체 ID 중 샘플 사용자 ID (id 컬럼만 읽음)"""
+    from load_data import open_parquet_file
+
+    with open_parquet_file('accounts_user', 'votes') as parquet_file:
+        user_ids = parquet_file.read(columns=['id']).column('id').to_numpy()
+
+    sampled = user_ids[is_sampled_user(user_ids, sample_rate)]
+    logger.info(f"   샘플 사용자: {len(sampled):,}명 / {len(user_ids):,}명 ({sample_rate * 100:g}%)")
+    return sampled
+
+
+@lru_cache(maxsize=None)
+def get_sampled_session_ids(sample_rate: float) -> np.ndarray:
+    """hackle 세션 중 샘플 사용자의 세션
+
+    세션마다 사용자를 먼저 하나로 확정한 뒤(마지막 non-null user_id, 속성 결합과 같은 기준) 판정하고,
+    사용자 기록이 전혀 없는 세션만 session_id 자체로 해시한다.
+    """
+    from load_data import open_parquet_file
+
+    with open_parquet_file('hackle_properties', 'hackle') as parquet_file:
+        sessions = resolve_session_properties(
+            parquet_file.read(columns=['id', 'session_id', 'user_id']).to_pandas()
+        )
+
+    sampled = is_sampled_user(sessions['user_id'], sample_rate)
+    no_user = sessions['user_id'].isna().to_numpy()
+    sampled[no_user] = is_sampled_user(sessions.loc[no_user, 'session_id'], sample_rate)
+
+    session_ids = sessions.loc[sampled, 'session_id'].to_numpy()
+    logger.info(f"   샘플 세션: {len(session_ids):,}개 / {len(sessions):,}개")
+    return session_ids
+
+
+def _base_table_name(table_name: str) -> str:
+    return table_name[:-len('_processed')] if table_name.endswith('_processed') else table_name
+
+
+def get_sample_filters(table_name: str, sample_rate: float):
+    """pyarrow 읽기 필터(DNF) - parquet 스캔 단계에서 샘플 외 행 제외
+
+    사용자 키가 정의되지 않은 테이블은 None (전체 로드)
+    """
+    base_name = _base_table_name(table_name)
+
+    if base_name in SAMPLE_KEYS:
+        user_ids = get_sampled_user_ids(sample_rate).tolist()
+        # 키 컬럼별 조건을 OR로 결합
+        return [[(col, 'in', user_ids)] for col in SAMPLE_KEYS[base_name]]
+
+    if base_name in SESSION_SAMPLED_TABLES:
+        return [[('session_id', 'in', get_sampled_session_ids(sample_rate).tolist())]]
+
+    logger.warning(f"⚠️ {table_name}: 샘플링 키 미정의 - 전체 데이터 사용")
+    return None
+
+
+def apply_sample_mask(df: pd.DataFrame, table_name: str, sample_rate: float) -> pd.DataFrame:
+    """이미 로드된 DataFrame(배치/파티션)에 읽기 필터와 같은 샘플 조건 적용"""
+    base_name = _base_table_name(table_name)
+
+    if base_name in SAMPLE_KEYS:
+        user_ids = get_sampled_user_ids(sample_rate)
+        keep = np.zeros(len(df), dtype=bool)
+        for col in SAMPLE_KEYS[base_name]:
+            keep |= df[col].isin(user_ids).to_numpy()
+        return df[keep]
+
+    if base_name in SESSION_SAMPLED_TABLES:
+        return df[df['session_id'].isin(get_sampled_session_ids(sample_rate))]
+
+    return df
+
+
+def sample_output_dataset(sample_rate: float = None) -> str:
+    """전처리 결과 저장 위치 - 샘플 실행은 운영 processed 데이터와 분리 (sample_rate=None이면 processed)"""
+    if sample_rate is None:
+        return 'processed'
+    return f"processed_sample_{sample_rate:g}"
@@ -4,10 +4,15 @@
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import logging
+from typing import Iterable
 from google.cloud import storage
 
+from parquet_layout import write_parquet_with_layout, get_layout_profile, parquet_writer_options
+
 logger = logging.getLogger(__name__)
 
 def save_to_gcs(df: pd.DataFrame, table_name: str, dataset: str = 'processed') -> dict:
@@ -26,14 +31,9 @@ def save_to_gcs(df: pd.DataFrame, table_name: str, dataset: str = 'processed') -
         logger.info(f"💾 {processed_table_name} 저장 시작...")
         logger.info(f"   저장할 데이터: {len(df):,}행, {df.shape[1]}열")
         
-        # 로컬에 임시 저장 - 압축 옵션 추가
+        # 로컬에 임시 저장 - 테이블별 레이아웃 프로파일 (정렬/row group/압축/통계)
         local_path = f"/tmp/{processed_table_name}_{os.getpid()}.parquet"
-        df.to_parquet(
-            local_path, 
-            engine='pyarrow', 
-            index=False,
-            compression='snappy'  # 압축으로 파일 크기 최적화
-        )
+        layout_info = write_parquet_with_layout(df, local_path, table_name)
         
         # 파일 크기 확인
         file_size_mb = os.path.getsize(local_path) / 1024**2
@@ -56,6 +56,8 @@ def save_to_gcs(df: pd.DataFrame, table_name: str, dataset: str = 'processed') -
             'rows': len(df),
             'columns': df.shape[1],
             'file_size_mb': round(file_size_mb, 1),
+            'row_groups': layout_info['row_groups'],
+            'sort_by': layout_info['sort_by'],
             'gcs_path': gcs_path
         }
         
@@ -78,6 +80,136 @@ def save_to_gcs(df: pd.DataFrame, table_name: str, dataset: str = 'processed') -
             except OSError as e:
                 logger.warning(f"임시 파일 정리 실패: {e}")
 
+def save_batches_to_gcs(batches: Iterable[pa.Table], table_name: str, dataset: str = 'processed',
+                        rows_per_file: int = None, presorted: bool = False,
+                        suffix: str = '_processed') -> dict:
+    """배치 스트림을 GCS에 parquet으로 저장 (전체 데이터를 메모리에 올리지 않음)
+
+    rows_per_file을 지정하면 {table}/part-00000.parquet 형태로 분할 저장하고,
+    완성된 파일은 즉시 업로드 후 삭제하여 로컬 디스크 사용량도 제한한다.
+    """
+
+    output_name = f"{table_name}{suffix}"
+    bucket_name = 'sprintda05_final_project'
+    row_group_size = get_layout_profile(table_name)['row_group_size'] or 1_000_000
+
+    client = storage.Client()
+    bucket = client.bucket(bucket_name)
+
+    total_rows = 0
+    total_size_mb = 0.0
+    uploaded_paths = []
+    num_columns = 0
+
+    writer = None
+    local_path = None
+    file_rows = 0
+    pending = []
+    pending_rows = 0
+
+    def blob_path_for(part_index):
+        if rows_per_file:
+            return f"{dataset}/{output_name}/part-{part_index:05d}.parquet"
+        return f"{dataset}/{output_name}.parquet"
+
+    def next_write_rows():
+        """다음 기록 단위 - row group 크기, 분할 저장 시 현재 파일의 남은 행 수 이하"""
+        if rows_per_file:
+            return min(row_group_size, rows_per_file - file_rows)
+        return row_group_size
+
+    def write_rows(table):
+        nonlocal writer, local_path, num_columns, file_rows
+        if writer is None:
+            local_path = f"/tmp/{output_name}_{os.getpid()}_{len(uploaded_paths):05d}.parquet"
+            writer = pq.ParquetWriter(
+                local_path, table.schema,
+                **parquet_writer_options(table.schema, table_name, presorted)
+            )
+            num_columns = table.num_columns
+
+        writer.write_table(table, row_group_size=row_group_size)
+        file_rows += table.num_rows
+
+        if rows_per_file and file_rows >= rows_per_file:
+            finish_file()
+
+    def finish_file():
+        nonlocal writer, local_path, file_rows, total_size_mb
+        writer.close()
+
+        file_size_mb = os.path.getsize(local_path) / 1024**2
+        blob_path = blob_path_for(len(uploaded_paths))
+        bucket.blob(blob_path).upload_from_filename(local_path, timeout=300)  # 5분 타임아웃
+        os.remove(local_path)
+
+        uploaded_paths.append(f"gs://{bucket_name}/{blob_path}")
+        total_size_mb += file_size_mb
+        logger.info(f"   업로드: {blob_path} ({file_rows:,}행, {file_size_mb:.1f}MB)")
+
+        writer, local_path, file_rows = None, None, 0
+
+    try:
+        logger.info(f"💾 {output_name} 스트리밍 저장 시작...")
+
+        for batch in batches:
+            if isinstance(batch, pa.RecordBatch):
+                batch = pa.Table.from_batches([batch])
+            if batch.num_rows == 0:
+                continue
+
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            total_rows += batch.num_rows
+
+            # row group 크기만큼 잘라서 기록 (작은 배치로 row group이 잘게 쪼개지거나
+            # 큰 배치로 파일이 rows_per_file을 넘지 않도록, 남은 행은 다음 배치와 합침)
+            while pending_rows >= next_write_rows():
+                buffered = pa.concat_tables(pending)
+                write_size = next_write_rows()
+                write_rows(buffered.slice(0, write_size))
+
+                remainder = buffered.slice(write_size)
+                pending = [remainder] if remainder.num_rows > 0 else []
+                pending_rows = remainder.num_rows
+
+        if pending:
+            write_rows(pa.concat_tables(pending))
+            pending, pending_rows = [], 0
+
+        if writer is not None:
+            finish_file()
+
+        if total_rows == 0:
+            raise ValueError(f"빈 데이터를 저장할 수 없습니다: {table_name}")
+
+        gcs_path = f"gs://{bucket_name}/{dataset}/{output_name}" + ('/' if rows_per_file else '.parquet')
+        result = {
+            'table_name': output_name,
+            'rows': total_rows,
+            'columns': num_columns,
+            'file_size_mb': round(total_size_mb, 1),
+            'files': len(uploaded_paths),
+            'gcs_path': gcs_path
+        }
+
+        logger.info(f"✅ {output_name} 저장 완료: {total_rows:,}행, 파일 {len(uploaded_paths)}개")
+        logger.info(f"   저장 경로: {gcs_path}")
+
+        return result
+
+    except Exception as e:
+        logger.error(f"❌ {output_name} 저장 실패: {str(e)}")
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+        if local_path and os.path.exists(local_path):
+            try:
+                os.remove(local_path)
+            except OSError as e:
+                logger.warning(f"임시 파일 정리 실패: {e}")
+
 # 사용 예시
 if __name__ == "__main__":
     # 예시 데이터프레임 저장
@@ -0,0 +1,230 @@
+"""
+입력 테이블 계약(contract) 검증 - parquet 메타데이터 우선, DataFrame 검사는 보완용
+담당: 김재문
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 테이블별 계약
+# - columns: 컬럼별 타입('integer', 'number', 'string', 'datetime', 'bool', None=검사 안 함),
+#            nullable(결측 허용 여부), min/max(값 범위)
+# - row_count: 허용 행 수 범위 (min, max), None이면 해당 방향 제한 없음
+TABLE_CONTRACTS = {
+    'accounts_user': {
+        'columns': {
+            'id': {'type': 'integer', 'nullable': False},
+            'point': {'type': 'number', 'nullable': False, 'min': 0},
+            'friend_id_list': {'type': 'string', 'nullable': True}
+        },
+        'row_count': (100_000, 10_000_000)
+    },
+    'accounts_userquestionrecord': {
+        'columns': {
+            'user_id': {'type': 'integer', 'nullable': False, 'min': 1},
+            'chosen_user_id': {'type': 'integer', 'nullable': False, 'min': 1},
+            'status': {'type': 'string', 'nullable': True},
+            'created_at': {'type': None, 'nullable': False}
+        },
+        'row_count': (100_000, 50_000_000)
+    },
+    'accounts_blockrecord': {
+        'columns': {
+            'user_id': {'type': 'integer', 'nullable': False, 'min': 1},
+            'block_user_id': {'type': 'integer', 'nullable': False, 'min': 1},
+            'reason': {'type': 'string', 'nullable': True}
+        },
+        'row_count': (1_000, 1_000_000)
+    },
+    'hackle_events': {
+        'columns': {
+            'event_id': {'type': 'string', 'nullable': False},
+            'event_datetime': {'type': 'datetime', 'nullable': False},
+            'event_key': {'type': 'string', 'nullable': False},
+            'session_id': {'type': 'string', 'nullable': False},
+            'friend_count': {'type': 'number', 'nullable': True, 'min': 0},
+            'votes_count': {'type': 'number', 'nullable': True, 'min': 0},
+            'heart_balance': {'type': 'number', 'nullable': True, 'min': 0}
+        },
+        'row_count': (1_000_000, 100_000_000)
+    }
+}
+
+
+def _arrow_type_matches(arrow_type: pa.DataType, expected: str) -> bool:
+    """arrow 타입이 계약 타입 분류에 맞는지 확인"""
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+
+    checks = {
+        'integer': pa.types.is_integer,
+        'number': lambda t: pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t),
+        'string': lambda t: pa.types.is_string(t) or pa.types.is_large_string(t),
+        'datetime': lambda t: pa.types.is_timestamp(t) or pa.types.is_date(t),
+        'bool': pa.types.is_boolean
+    }
+    return checks[expected](arrow_type)
+
+
+def _pandas_type_matches(series: pd.Series, expected: str) -> bool:
+    """pandas dtype이 계약 타입 분류에 맞는지 확인"""
+    checks = {
+        'integer': pd.api.types.is_integer_dtype,
+        'number': lambda s: pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s),
+        'string': lambda s: pd.api.types.is_string_dtype(s) or pd.api.types.is_object_dtype(s),
+        'datetime': pd.api.types.is_datetime64_any_dtype,
+        'bool': pd.api.types.is_bool_dtype
+    }
+    return checks[expected](series)
+
+
+def validate_parquet_metadata(metadata: pq.FileMetaData, table_name: str) -> dict:
+    """parquet footer(스키마/row group 통계/행 수)로 계약 검증
+
+    통계가 없어 메타데이터로 판단할 수 없는 검사는 pending으로 반환하여
+    로드 후 validate_dataframe에서 처리한다.
+    """
+
+    contract = TABLE_CONTRACTS.get(table_name)
+    if contract is None:
+        logger.info(f"   {table_name}: 정의된 계약 없음 - 검증 생략")
+        return {'table_name': table_name, 'rows': metadata.num_rows, 'pending': {}}
+
+    errors = []
+    pending = {}
+    schema = metadata.schema.to_arrow_schema()
+
+    # 1. 행 수
+    min_rows, max_rows = contract['row_count']
+    if min_rows is not None and metadata.num_rows < min_rows:
+        errors.append(f"행 수 부족: {metadata.num_rows:,}행 < {min_rows:,}행")
+    if max_rows is not None and metadata.num_rows > max_rows:
+        errors.append(f"행 수 초과: {metadata.num_rows:,}행 > {max_rows:,}행")
+
+    for col, rule in contract['columns'].items():
+        # 2. 스키마 (컬럼 존재 / 타입)
+        if col not in schema.names:
+            errors.append(f"필수 컬럼 누락: {col}")
+            continue
+
+        if rule['type'] is not None and not _arrow_type_matches(schema.field(col).type, rule['type']):
+            errors.append(f"타입 불일치: {col} ({schema.field(col).type}, 기대: {rule['type']})")
+            continue
+
+        # 3. row group 통계 (null 수 / 최소·최대값)
+        column_index = metadata.schema.names.index(col)
+        null_count = 0
+        col_min = col_max = None
+        has_null_stats = has_range_stats = metadata.num_row_groups > 0
+
+        for rg in range(metadata.num_row_groups):
+            stats = metadata.row_group(rg).column(column_index).statistics
+            if stats is None:
+                has_null_stats = has_range_stats = False
+                break
+
+            if stats.has_null_count:
+                null_count += stats.null_count
+            else:
+                has_null_stats = False
+
+            if stats.has_min_max:
+                col_min = stats.min if col_min is None else min(col_min, stats.min)
+                col_max = stats.max if col_max is None else max(col_max, stats.max)
+            elif stats.num_values > 0:
+                has_range_stats = False
+
+        if not rule['nullable']:
+            if not has_null_stats:
+                pending.setdefault(col, []).append('nullable')
+            elif null_count > 0:
+                errors.append(f"결측치 불허 컬럼에 결측 존재: {col} ({null_count:,}건)")
+
+        if 'min' in rule or 'max' in rule:
+            if not has_range_stats:
+                pending.setdefault(col, []).append('range')
+            else:
+                if 'min' in rule and col_min is not None and col_min < rule['min']:
+                    errors.append(f"범위 위반: {col} 최소값 {col_min} < {rule['min']}")
+                if 'max' in rule and col_max is not None and col_max > rule['max']:
+                    errors.append(f"범위 위반: {col} 최대값 {col_max} > {rule['max']}")
+
+    if errors:
+        raise ValueError(f"{table_name} 계약 위반 (메타데이터): {errors}")
+
+    logger.info(f"✅ {table_name} 메타데이터 검증 통과: {metadata.num_rows:,}행")
+    if pending:
+        logger.info(f"   로드 후 추가 검증 필요: {pending}")
+
+    return {'table_name': table_name, 'rows': metadata.num_rows, 'pending': pending}
+
+
+def validate_table_metadata(table_name: str, dataset: str) -> dict:
+    """GCS 테이블 footer만 읽어 로드 전에 계약 검증"""
+    from load_data import load_parquet_metadata
+
+    metadata = load_parquet_metadata(table_name, dataset)
+    return validate_parquet_metadata(metadata, table_name)
+
+
+def validate_dataframe(df: pd.DataFrame, table_name: str, pending: dict = None,
+                       check_row_count: bool = True) -> None:
+    """로드된 DataFrame에 대한 벡터화 계약 검증
+
+    pending이 주어지면 메타데이터 단계에서 확인하지 못한 항목만 검사한다.
+    """
+
+    contract = TABLE_CONTRACTS.get(table_name)
+    if contract is None:
+        return
+
+    errors = []
+    full_check = pending is None
+
+    if full_check and check_row_count:
+        min_rows, max_rows = contract['row_count']
+        if min_rows is not None and len(df) < min_rows:
+            errors.append(f"행 수 부족: {len(df):,}행 < {min_rows:,}행")
+        if max_rows is not None and len(df) > max_rows:
+            errors.append(f"행 수 초과: {len(df):,}행 > {max_rows:,}행")
+
+    for col, rule in contract['columns'].items():
+        checks = ['type', 'nullable', 'range'] if full_check else (pending or {}).get(col, [])
+        if not checks:
+            continue
+
+        if col not in df.columns:
+            errors.append(f"필수 컬럼 누락: {col}")
+            continue
+
+        series = df[col]
+
+        if 'type' in checks and rule['type'] is not None and not _pandas_type_matches(series, rule['type']):
+            errors.append(f"타입 불일치: {col} ({series.dtype}, 기대: {rule['type']})")
+            continue
+
+        if 'nullable' in checks and not rule['nullable']:
+            null_count = series.isna().sum()
+            if null_count > 0:
+                errors.append(f"결측치 불허 컬럼에 결측 존재: {col} ({null_count:,}건)")
+
+        if 'range' in checks and ('min' in rule or 'max' in rule):
+            if 'min' in rule and (series < rule['min']).any():
+                errors.append(f"범위 위반: {col} 최소값 {series.min()} < {rule['min']}")
+            if 'max' in rule and (series > rule['max']).any():
+                errors.append(f"범위 위반: {col} 최대값 {series.max()} > {rule['max']}")
+
+    if errors:
+        raise ValueError(f"{table_name} 계약 위반 (데이터): {errors}")
+
+# 사용 예시
+if __name__ == "__main__":
+    try:
+        report = validate_table_metadata('accounts_user', 'votes')
+        print(f"검증 통과: {report}")
+    except Exception as e:
+        print(f"테스트 실패: {e}")